@@ -1,12 +1,15 @@
 import logging
-from pathlib import Path
 from typing import Annotated, Any
+from urllib.parse import urlsplit
 
 import requests
 from pydantic import Field
 
 from app.bookers.clubspark.token_manager import TokenManager
+from app.core import http
 from app.core.config.clubspark import ClubsparkUserConfig
+from app.core.errors import AuthExpiredError, raise_for_response
+from app.core.hedging import hedger
 from app.models.clubspark_responses import (
     AppSettingsResponse,
     CreatePaymentResponse,
@@ -30,12 +33,13 @@ class AppBooker:
         Args:
             user: The ClubsparkUserConfig object containing user information
         """
+        self.account = user.id
         self.token_manager = TokenManager(user)
 
     def _clubspark_headers(self) -> dict[str, str]:
         auth_header = self.token_manager.get_auth_header()
         if not auth_header:
-            raise RuntimeError("No valid authentication token available")
+            raise AuthExpiredError("No valid authentication token available")
 
         return {
             "accept": "*/*",
@@ -74,10 +78,15 @@ class AppBooker:
         )
 
         LOGGER.debug("GET %s", url)
-        response = requests.get(url, headers=headers, timeout=30)
+        endpoint = urlsplit(url).path.rsplit("/", 1)[-1]
+        response = hedger.call(
+            endpoint,
+            lambda: http.send(
+                "GET", url, account=self.account, headers=headers, timeout=30
+            ),
+        )
 
-        if response.status_code >= 299:
-            raise Exception(f"Request failed with status code {response.status_code}")
+        raise_for_response(response)
 
         return response
 
@@ -94,10 +103,11 @@ class AppBooker:
         )
 
         LOGGER.debug("POST %s %s", url, content)
-        response = requests.post(url, json=content, headers=headers, timeout=30)
+        response = http.send(
+            "POST", url, account=self.account, json=content, headers=headers, timeout=30
+        )
 
-        if response.status_code >= 299:
-            raise Exception(f"Request failed with status code {response.status_code}")
+        raise_for_response(response)
 
         return response
 
@@ -165,18 +175,25 @@ class AppBooker:
         start_time: int,
         resource_id: str,
         session_id: str,
+        credits_applied: float = 0,
     ) -> RequestSessionResponse:
+        """
+        Reserve a session, paid by payment_token and/or venue credit.
+
+        With credits_applied, that much of total_paid comes from the user's
+        credit at the venue and only the rest from the payment.
+        """
         url = f"https://api.clubspark.uk/v0/VenueBooking/{venue_slug}/RequestSession"
 
         headers = self._get_headers(clubspark_headers=True)
 
         content: dict[str, str | int] = {
-            "CreditsApplied": "0",
+            "CreditsApplied": str(credits_applied) if credits_applied else "0",
             "PaymentToken": payment_token,
             "Date": date,
             "Duration": duration,
             "Source": "iOS",
-            "TotalPaid": str(total_paid),
+            "TotalPaid": str(total_paid - credits_applied),
             "StartTime": start_time,
             "GrossAmount": str(total_paid),
             "ResourceID": resource_id,
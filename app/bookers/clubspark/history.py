@@ -0,0 +1,278 @@
+import argparse
+import datetime
+import json
+import logging
+import sqlite3
+import statistics
+import threading
+import time
+from collections import defaultdict
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from app.bookers.clubspark.app_booker import AppBooker
+from app.core.config.app import HistoryConfig
+from app.core.config.clubspark import ClubsparkUserConfig
+from app.core.release_times import midnight
+from app.core.settings import get_settings
+from app.models.clubspark_responses import GetAvailabilityTimesResponse
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ReleaseObservation:
+    venue: str
+    date: str
+    duration: int
+    release_at: float
+    # seconds after release at which each "time/court" stopped being available
+    sellout: dict[str, float] = field(default_factory=dict)
+
+
+class AvailabilityHistory:
+    """
+    SQLite store of compact GetAvailabilityTimes snapshots.
+
+    Each snapshot is one row holding a JSON map of start time to the names of
+    the courts available at that time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY,
+                    venue TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    duration INTEGER NOT NULL,
+                    captured_at REAL NOT NULL,
+                    slots TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS snapshots_by_venue
+                    ON snapshots (venue, date, duration, captured_at);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def record(
+        self,
+        venue: str,
+        date: str,
+        duration: int,
+        response: GetAvailabilityTimesResponse,
+        captured_at: Optional[float] = None,
+    ) -> None:
+        slots = {
+            str(ts.Time): [r.Name for r in ts.Resources]
+            for ts in response.Times
+            if ts.Resources
+        }
+        with self.lock, closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO snapshots (venue, date, duration, captured_at, slots) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    venue,
+                    date,
+                    duration,
+                    captured_at or time.time(),
+                    json.dumps(slots, separators=(",", ":")),
+                ),
+            )
+
+    def snapshots(
+        self, venue: Optional[str] = None
+    ) -> dict[tuple[str, str, int], list[tuple[float, dict[str, list[str]]]]]:
+        query = "SELECT venue, date, duration, captured_at, slots FROM snapshots"
+        params: tuple[str, ...] = ()
+        if venue is not None:
+            query += " WHERE venue = ?"
+            params = (venue,)
+        query += " ORDER BY venue, date, duration, captured_at"
+
+        grouped: dict[
+            tuple[str, str, int], list[tuple[float, dict[str, list[str]]]]
+        ] = defaultdict(list)
+        with closing(self._connect()) as conn:
+            for v, d, duration, captured_at, slots in conn.execute(query, params):
+                grouped[(v, d, duration)].append((captured_at, json.loads(slots)))
+        return grouped
+
+    def observations(self, venue: Optional[str] = None) -> list[ReleaseObservation]:
+        """Infer the release instant and sell-out times for each recorded release."""
+        observations: list[ReleaseObservation] = []
+        for (v, d, duration), snaps in self.snapshots(venue).items():
+            observation = _observe_release(v, d, duration, snaps)
+            if observation is not None:
+                observations.append(observation)
+        return observations
+
+
+def _observe_release(
+    venue: str,
+    date: str,
+    duration: int,
+    snaps: list[tuple[float, dict[str, list[str]]]],
+) -> Optional[ReleaseObservation]:
+    # the release is the first non-empty snapshot that follows an empty one
+    for i in range(1, len(snaps)):
+        if snaps[i][1] and not snaps[i - 1][1]:
+            break
+    else:
+        return None
+
+    before, released_at = snaps[i - 1][0], snaps[i][0]
+    # releases happen on the minute; prefer that if it is inside the bracket
+    on_minute = (int(before) // 60 + 1) * 60
+    release_at = on_minute if on_minute <= released_at else released_at
+
+    observation = ReleaseObservation(venue, date, duration, release_at)
+    remaining = {(t, court) for t, courts in snaps[i][1].items() for court in courts}
+    for captured_at, slots in snaps[i + 1 :]:
+        current = {(t, court) for t, courts in slots.items() for court in courts}
+        for t, court in remaining - current:
+            observation.sellout[f"{t}/{court}"] = round(captured_at - release_at, 3)
+        remaining &= current
+    return observation
+
+
+def release_offset(observation: ReleaseObservation, tz: str) -> datetime.timedelta:
+    """The offset before midnight of the booking date at which slots were released."""
+    zone = ZoneInfo(tz)
+    released_at = datetime.datetime.fromtimestamp(observation.release_at, zone)
+    # wall-clock difference, matching how release_time applies offsets
+    return midnight(datetime.date.fromisoformat(observation.date), zone).replace(
+        tzinfo=None
+    ) - released_at.replace(tzinfo=None)
+
+
+def inferred_offsets(
+    history: AvailabilityHistory, tz: str, min_samples: int = 1
+) -> dict[str, tuple[datetime.timedelta, int]]:
+    """Median observed release offset and sample count per venue."""
+    offsets: dict[str, list[float]] = defaultdict(list)
+    for observation in history.observations():
+        offsets[observation.venue].append(
+            release_offset(observation, tz).total_seconds()
+        )
+
+    return {
+        venue: (datetime.timedelta(seconds=statistics.median(values)), len(values))
+        for venue, values in offsets.items()
+        if len(values) >= min_samples
+    }
+
+
+def sellout_ranking(history: AvailabilityHistory, venue: str) -> dict[str, float]:
+    """Median seconds-to-sell-out per time/court, fastest first."""
+    seconds: dict[str, list[float]] = defaultdict(list)
+    for observation in history.observations(venue):
+        for key, value in observation.sellout.items():
+            seconds[key].append(value)
+
+    medians = {key: statistics.median(values) for key, values in seconds.items()}
+    return dict(sorted(medians.items(), key=lambda item: item[1]))
+
+
+def split_offset(offset: datetime.timedelta) -> dict[str, int]:
+    """Express an offset in the days/hours/minutes form of a release schedule."""
+    total_minutes = round(offset.total_seconds() / 60)
+    days, rest = divmod(total_minutes, 24 * 60)
+    hours, minutes = divmod(rest, 60)
+    return {"days": days, "hours": hours, "minutes": minutes}
+
+
+_history: Optional[AvailabilityHistory] = None
+
+
+def configure_history(config: HistoryConfig) -> Optional[AvailabilityHistory]:
+    global _history
+    _history = AvailabilityHistory(config.path) if config.enabled else None
+    return _history
+
+
+def get_history() -> Optional[AvailabilityHistory]:
+    return _history
+
+
+def record_release_window(
+    user_id: str,
+    venue_slug: str,
+    date: str,
+    durations: list[int],
+    release_at: datetime.datetime,
+) -> None:
+    """Snapshot availability around a release on a background thread."""
+    if _history is None:
+        return
+
+    settings = get_settings()
+    user = settings.clubspark.get_user_by_id(user_id)
+    config = settings.app.history
+
+    thread = threading.Thread(
+        target=_record_release_window,
+        args=(_history, user, venue_slug, date, durations, release_at, config),
+        name=f"history-{venue_slug}-{date}",
+        daemon=True,
+    )
+    thread.start()
+
+
+def _record_release_window(
+    history: AvailabilityHistory,
+    user: ClubsparkUserConfig,
+    venue_slug: str,
+    date: str,
+    durations: list[int],
+    release_at: datetime.datetime,
+    config: HistoryConfig,
+) -> None:
+    booker = AppBooker(user)
+    end = release_at.timestamp() + config.seconds_after_release
+    LOGGER.info(f"Recording availability for {venue_slug} on {date}")
+    while time.time() < end:
+        started = time.monotonic()
+        for duration in durations:
+            try:
+                response = booker.get_availability_times(
+                    venue_slug=venue_slug, date=date, duration=duration
+                )
+                history.record(venue_slug, date, duration, response)
+            except Exception as e:
+                LOGGER.warning(f"Failed to record availability for {venue_slug}: {e}")
+        time.sleep(max(0.0, config.interval_seconds - (time.monotonic() - started)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Infer release offsets and sell-out speed from recorded history"
+    )
+    parser.add_argument("--path", default=HistoryConfig().path)
+    parser.add_argument("--timezone", default="Europe/London")
+    parser.add_argument("--min-samples", type=int, default=1)
+    args = parser.parse_args()
+
+    history = AvailabilityHistory(args.path)
+    offsets = inferred_offsets(history, args.timezone, args.min_samples)
+    report = {
+        venue: {
+            "samples": samples,
+            "suggested_release_schedule": {"id": venue, **split_offset(offset)},
+            "sellout_seconds": sellout_ranking(history, venue),
+        }
+        for venue, (offset, samples) in offsets.items()
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
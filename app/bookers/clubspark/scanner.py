@@ -0,0 +1,243 @@
+import argparse
+import csv
+import datetime
+import io
+import json
+import logging
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Optional
+from zoneinfo import ZoneInfo
+
+from app.bookers.clubspark.app_booker import AppBooker
+from app.bookers.clubspark.utils import score_slots
+from app.booking.pipeline import submit
+from app.core.config.app import BucketConfig
+from app.core.config.clubspark import ClubsparkConfig
+from app.core.egress import egress
+from app.core.rate_limit import SCAN, rate_limiter, request_budget
+from app.core.settings import get_settings
+from app.models.clubspark_responses import GetAvailabilityTimesResponse
+
+LOGGER = logging.getLogger(__name__)
+
+# venue, date, duration
+Query = tuple[str, str, int]
+
+
+def minutes_to_timestr(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def scan(
+    booker: AppBooker, queries: list[Query], workers: int
+) -> dict[Query, Optional[GetAvailabilityTimesResponse]]:
+    """Availability for every query on a bounded pool; None where a request failed."""
+    # log in once up front rather than once per thread
+    booker.token_manager.get_auth_header()
+
+    results: dict[Query, Optional[GetAvailabilityTimesResponse]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            submit(
+                pool,
+                booker.get_availability_times,
+                venue_slug=venue,
+                date=date,
+                duration=duration,
+            ): (venue, date, duration)
+            for venue, date, duration in queries
+        }
+        for future in as_completed(futures):
+            query = futures[future]
+            try:
+                results[query] = future.result()
+            except Exception as e:
+                LOGGER.warning("Failed to fetch %s: %s", query, e)
+                results[query] = None
+    return results
+
+
+def matrix(
+    results: dict[Query, Optional[GetAvailabilityTimesResponse]],
+) -> dict[str, dict[str, dict[str, Optional[dict[str, list[str]]]]]]:
+    """venue -> date -> duration -> start time -> free courts (None if unknown)."""
+    report: dict[str, dict[str, dict[str, Optional[dict[str, list[str]]]]]] = {}
+    for (venue, date, duration), response in sorted(results.items()):
+        times = (
+            None
+            if response is None
+            else {
+                minutes_to_timestr(ts.Time): [r.Name for r in ts.Resources]
+                for ts in response.Times
+                if ts.Resources
+            }
+        )
+        report.setdefault(venue, {}).setdefault(date, {})[str(duration)] = times
+    return report
+
+
+def slot_report(
+    settings: ClubsparkConfig,
+    results: dict[Query, Optional[GetAvailabilityTimesResponse]],
+) -> dict[str, dict[str, Optional[dict[str, Any]]]]:
+    """Per booking slot and matching date, the best free time and court if any."""
+    report: dict[str, dict[str, Optional[dict[str, Any]]]] = {}
+    for slot in settings.booking_slots:
+        assert slot.id is not None
+        duration = 120 if slot.double_session else 60
+        dates: dict[str, Optional[dict[str, Any]]] = {}
+        for (venue, date, d), response in sorted(results.items()):
+            if venue != slot.target_park or d != duration or response is None:
+                continue
+            if datetime.date.fromisoformat(date).strftime("%A").lower() != (
+                slot.target_day
+            ):
+                continue
+            ranked = score_slots(response.Times, slot)
+            dates[date] = (
+                {
+                    "time": minutes_to_timestr(ranked[0][1]),
+                    "court": ranked[0][2].Name,
+                    "matching": len(ranked),
+                }
+                if ranked
+                else None
+            )
+        report[slot.id] = dates
+    return report
+
+
+def to_csv(
+    results: dict[Query, Optional[GetAvailabilityTimesResponse]],
+) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["venue", "date", "day", "duration", "time", "free", "courts"])
+    for (venue, date, duration), response in sorted(results.items()):
+        day = datetime.date.fromisoformat(date).strftime("%A").lower()
+        if response is None:
+            writer.writerow([venue, date, day, duration, "", "", "error"])
+            continue
+        for ts in response.Times:
+            if ts.Resources:
+                writer.writerow(
+                    [
+                        venue,
+                        date,
+                        day,
+                        duration,
+                        minutes_to_timestr(ts.Time),
+                        len(ts.Resources),
+                        ";".join(r.Name for r in ts.Resources),
+                    ]
+                )
+    return out.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Scan Clubspark availability across venues, dates and durations"
+    )
+    parser.add_argument("--user", help="user whose token to scan with")
+    parser.add_argument(
+        "--venues", help="comma-separated venue slugs (default: every configured)"
+    )
+    parser.add_argument("--start", help="first date (default: today)")
+    parser.add_argument("--days", type=int, default=21)
+    parser.add_argument(
+        "--durations", help="comma-separated minutes (default: configured)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="concurrent requests (default: 8); beyond the rate times a request's "
+        "latency, more only queue on the rate limiter",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="requests per second (default: the scan budget in app.rate_limit)",
+    )
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    clubspark = settings.clubspark
+    rate_limit = settings.app.rate_limit
+    if args.rate is not None:
+        bucket = BucketConfig(rate=args.rate, burst=max(1, math.ceil(args.rate)))
+        rate_limit = rate_limit.model_copy(
+            update={
+                "host": {**rate_limit.host, SCAN: bucket},
+                "account": {**rate_limit.account, SCAN: bucket},
+            }
+        )
+    rate_limiter.configure(rate_limit)
+    egress.configure(settings.app.egress)
+
+    user = clubspark.get_user_by_id(args.user) if args.user else clubspark.users[0]
+    venues = (
+        args.venues.split(",")
+        if args.venues
+        else sorted(
+            {slot.target_park for slot in clubspark.booking_slots}
+            | {p for slot in clubspark.booking_slots for p in slot.fallback_parks}
+        )
+    )
+    durations = (
+        [int(d) for d in args.durations.split(",")]
+        if args.durations
+        else sorted(
+            {120 if slot.double_session else 60 for slot in clubspark.booking_slots}
+        )
+    )
+    start = (
+        datetime.date.fromisoformat(args.start)
+        if args.start
+        else datetime.datetime.now(ZoneInfo(settings.app.timezone)).date()
+    )
+    dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(args.days)]
+    queries = [
+        (v, d, duration) for v in venues for d in dates for duration in durations
+    ]
+
+    print(
+        f"Scanning {len(queries)} queries, expected to take about "
+        f"{rate_limiter.expected_seconds(SCAN, len(queries)):.0f}s",
+        file=sys.stderr,
+    )
+    started = time.perf_counter()
+    with request_budget(SCAN):
+        results = scan(AppBooker(user), queries, args.workers)
+    elapsed = time.perf_counter() - started
+    failed = sum(response is None for response in results.values())
+    LOGGER.info(f"Scanned {len(queries)} queries in {elapsed:.1f}s ({failed} failed)")
+
+    if args.format == "csv":
+        output = to_csv(results)
+    else:
+        output = json.dumps(
+            {
+                "scanned": len(queries),
+                "failed": failed,
+                "elapsed_s": round(elapsed, 3),
+                "slots": slot_report(clubspark, results),
+                "availability": matrix(results),
+            },
+            indent=2,
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + ("" if output.endswith("\n") else "\n"))
+
+
+if __name__ == "__main__":
+    main()
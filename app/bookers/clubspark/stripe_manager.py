@@ -4,6 +4,8 @@ from typing import Annotated, Any
 import requests
 from pydantic import Field
 
+from app.core import http
+from app.core.errors import raise_for_response
 from app.models.stripe import PaymentMethodResponse
 
 Content = Annotated[dict[Any, Any], Field(discriminator="type")]
@@ -48,10 +50,9 @@ class StripeManager:
         )
 
         LOGGER.debug("GET %s", url)
-        response = requests.get(url, headers=request_headers, timeout=30)
+        response = http.send("GET", url, headers=request_headers, timeout=30)
 
-        if response.status_code >= 299:
-            raise Exception(f"Request failed with status code {response.status_code}")
+        raise_for_response(response)
 
         return response
 
@@ -61,6 +62,7 @@ class StripeManager:
         content: Content,
         stripe_headers: bool = False,
         headers: dict[str, str] | None = None,
+        idempotent: bool = False,
     ) -> requests.Response:
         headers = self._get_headers(
             stripe_headers=stripe_headers,
@@ -68,12 +70,16 @@ class StripeManager:
         )
 
         LOGGER.debug("POST %s %s", url, content)
-        response = requests.post(url, data=content, headers=headers, timeout=30)
+        response = http.send(
+            "POST",
+            url,
+            idempotent=idempotent,
+            data=content,
+            headers=headers,
+            timeout=30,
+        )
 
-        if response.status_code >= 299:
-            raise Exception(
-                f"Request failed with status code {response.status_code}: {response.text}"
-            )
+        raise_for_response(response)
 
         return response
 
@@ -112,7 +118,8 @@ class StripeManager:
             "type": "card",
         }
 
+        # an unused payment method costs nothing, so it's safe to make another
         response = self._post(
-            url, content=content, headers=headers, stripe_headers=False
+            url, content=content, headers=headers, stripe_headers=False, idempotent=True
         )
         return PaymentMethodResponse.model_validate(response.json())
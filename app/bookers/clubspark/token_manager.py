@@ -6,19 +6,56 @@ from pathlib import Path
 from typing import Any, Optional
 
 import requests
-from jose import jwt
 
+from app.core import http
 from app.core.config.clubspark import ClubsparkUserConfig
 
 logger = logging.getLogger(__name__)
 
 
+def token_file(user_id: str) -> Path:
+    return Path(f"{user_id}_clubspark_tokens.json")
+
+
+def stored_token_status(user_id: str) -> dict[str, Any]:
+    """Validity of a user's saved tokens, read from disk without fetching any"""
+    path = token_file(user_id)
+    status: dict[str, Any] = {
+        "has_refresh_token": False,
+        "has_access_token": False,
+        "access_token_valid": False,
+        "expires_at": None,
+    }
+    if not path.exists():
+        return status
+
+    try:
+        tokens = json.loads(path.read_text())
+    except Exception as e:
+        status["error"] = str(e)
+        return status
+
+    access_token = tokens.get("access_token")
+    status["has_refresh_token"] = bool(tokens.get("refresh_token"))
+    status["has_access_token"] = bool(access_token)
+    if access_token:
+        try:
+            from jose import jwt
+
+            exp = jwt.get_unverified_claims(access_token).get("exp", 0)
+            status["expires_at"] = exp
+            status["access_token_valid"] = datetime.now(timezone.utc).timestamp() < exp
+        except Exception as e:
+            status["error"] = str(e)
+    return status
+
+
 class TokenManager:
     """Manages OAuth2 tokens for ClubSpark API with automatic refresh"""
 
     def __init__(self, user_config: ClubsparkUserConfig):
         self.user_config = user_config
-        self.config_file = Path(f"{user_config.id}_clubspark_tokens.json")
+        self.config_file = token_file(user_config.id)
 
         # OAuth2 client credentials (from your captured traffic)
         self.client_id = "clubspark-app"
@@ -90,6 +127,8 @@ class TokenManager:
             return False
 
         try:
+            from jose import jwt
+
             # Decode JWT without verification to check expiry
             payload = jwt.get_unverified_claims(access_token)
             exp = payload.get("exp", 0)
@@ -132,7 +171,13 @@ class TokenManager:
 
         try:
             logger.info("Fetching initial token using username/password...")
-            response = requests.post(self.token_url, headers=headers, json=data)
+            response = http.send(
+                "POST",
+                self.token_url,
+                account=self.user_config.id,
+                headers=headers,
+                json=data,
+            )
             response.raise_for_status()
 
             token_data = response.json()
@@ -185,7 +230,13 @@ class TokenManager:
 
         try:
             logger.info("Refreshing access token...")
-            response = requests.post(self.token_url, headers=headers, json=data)
+            response = http.send(
+                "POST",
+                self.token_url,
+                account=self.user_config.id,
+                headers=headers,
+                json=data,
+            )
             response.raise_for_status()
 
             token_data = response.json()
@@ -244,6 +295,8 @@ class TokenManager:
 
         if access_token:
             try:
+                from jose import jwt
+
                 payload = jwt.get_unverified_claims(access_token)
                 info.update(
                     {
@@ -1,20 +1,32 @@
 import datetime
+import math
+import re
+from collections import defaultdict
 
 from app.core.config.clubspark import ClubsparkBookingSlot
 from app.models.clubspark_responses import ResourceSlot, TimeSlot
 
 
-def rank_slots(
-    slots: list[TimeSlot], booking_slot: ClubsparkBookingSlot
-) -> list[tuple[int, ResourceSlot]]:
+def score_slots(
+    slots: list[TimeSlot], booking_slot: ClubsparkBookingSlot, any_court: bool = False
+) -> list[tuple[float, int, ResourceSlot]]:
+    """
+    (score, time, resource) for each slot matching the preferences, best first.
+
+    Courts are ranked by their place in target_courts; with any_court (for
+    fallback venues, whose court numbers mean nothing here) every court ranks
+    after the preferred ones.
+    """
     preferred_times_ints = [timestr_to_int(t) for t in booking_slot.target_times]
     preferred_courts = [f"Court {i}" for i in booking_slot.target_courts]
 
-    ranked_slots: list[tuple[int | float, int, ResourceSlot]] = []
+    ranked_slots: list[tuple[float, int, ResourceSlot]] = []
     for ts in slots:
         time_rank = index_rank(ts.Time, preferred_times_ints)
         for resource in ts.Resources:
             court_rank = index_rank(resource.Name, preferred_courts)
+            if any_court and court_rank == float("inf"):
+                court_rank = len(preferred_courts)
 
             total_rank = 100 * time_rank + court_rank
             ranked_slots.append((total_rank, ts.Time, resource))
@@ -23,8 +35,228 @@ def rank_slots(
     valid_slots = [
         (rank, time, resource) for (rank, time, resource) in ranked_slots if rank < 9999
     ]
-    valid_slots.sort()
-    return [(time, resource) for (_, time, resource) in valid_slots]
+    valid_slots.sort(key=lambda slot: (slot[0], slot[1]))
+    return valid_slots
+
+
+def rank_slots(
+    slots: list[TimeSlot], booking_slot: ClubsparkBookingSlot
+) -> list[tuple[int, ResourceSlot]]:
+    return [
+        (time, resource) for (_, time, resource) in score_slots(slots, booking_slot)
+    ]
+
+
+def court_number(name: str) -> int | None:
+    """The number in a court name like "Court 3", if there is one."""
+    match = re.search(r"\d+", name)
+    return int(match.group()) if match else None
+
+
+def score_sets(
+    slots: list[TimeSlot], booking_slot: ClubsparkBookingSlot, any_court: bool = False
+) -> list[tuple[float, list[tuple[int, ResourceSlot]]]]:
+    """
+    (score, members) for each set of quantity resources that fits together.
+
+    With "courts" adjacency every member is at the same time on consecutively
+    numbered courts, and the score is the sum of theirs. With "hours" the first
+    member is a preferred time and the rest follow on the same court, and the
+    score is the first member's.
+    """
+    quantity = booking_slot.quantity
+    scored = score_slots(slots, booking_slot, any_court)
+    sets: list[tuple[float, list[tuple[int, ResourceSlot]]]] = []
+
+    if quantity == 1:
+        sets = [(score, [(time, resource)]) for score, time, resource in scored]
+
+    elif booking_slot.adjacency == "courts":
+        by_time: dict[int, list[tuple[int, float, ResourceSlot]]] = defaultdict(list)
+        for score, time, resource in scored:
+            number = court_number(resource.Name)
+            if number is not None:
+                by_time[time].append((number, score, resource))
+        for time, courts in by_time.items():
+            courts.sort(key=lambda court: court[0])
+            for i in range(len(courts) - quantity + 1):
+                window = courts[i : i + quantity]
+                if window[-1][0] - window[0][0] == quantity - 1:
+                    sets.append(
+                        (
+                            sum(score for _, score, _ in window),
+                            [(time, resource) for _, _, resource in window],
+                        )
+                    )
+
+    else:
+        step = 120 if booking_slot.double_session else 60
+        available = {(ts.Time, r.Name): r for ts in slots for r in ts.Resources}
+        for score, time, resource in scored:
+            members = [(time, resource)]
+            for k in range(1, quantity):
+                following = available.get((time + k * step, resource.Name))
+                if following is None:
+                    break
+                members.append((time + k * step, following))
+            else:
+                sets.append((score, members))
+
+    sets.sort(key=lambda s: (s[0], s[1][0][0]))
+    return sets
+
+
+def score_completions(
+    slots: list[TimeSlot],
+    booking_slot: ClubsparkBookingSlot,
+    held: list[tuple[int, str]],
+    any_court: bool = False,
+) -> list[tuple[float, list[tuple[int, ResourceSlot]]]]:
+    """
+    (score, missing members) for each way to complete a set around held.
+
+    held is the (time, court name) of each member already booked. With
+    "courts" adjacency the set is a run of courts at their time containing
+    them, scored like score_sets. With "hours" it's a run of sessions on their
+    court, and runs starting earlier than the first held one score worse.
+    """
+    quantity = booking_slot.quantity
+    sets: list[tuple[float, list[tuple[int, ResourceSlot]]]] = []
+
+    if booking_slot.adjacency == "courts":
+        held_numbers = [court_number(name) for _, name in held]
+        numbers = {n for n in held_numbers if n is not None}
+        times = {time for time, _ in held}
+        if len(numbers) != len(held) or len(times) != 1:
+            return []
+        time = times.pop()
+        free = {
+            court_number(resource.Name): (score, resource)
+            for score, slot_time, resource in score_slots(
+                slots, booking_slot, any_court
+            )
+            if slot_time == time and court_number(resource.Name) is not None
+        }
+        low, high = min(numbers), max(numbers)
+        for start in range(high - quantity + 1, low + 1):
+            wanted = [n for n in range(start, start + quantity) if n not in numbers]
+            if all(n in free for n in wanted):
+                sets.append(
+                    (
+                        sum(free[n][0] for n in wanted),
+                        [(time, free[n][1]) for n in wanted],
+                    )
+                )
+
+    else:
+        names = {name for _, name in held}
+        if len(names) != 1:
+            return []
+        name = names.pop()
+        step = 120 if booking_slot.double_session else 60
+        available = {ts.Time: r for ts in slots for r in ts.Resources if r.Name == name}
+        times = {time for time, _ in held}
+        first, last = min(times), max(times)
+        for start in range(last - (quantity - 1) * step, first + 1, step):
+            run = [start + k * step for k in range(quantity)]
+            if not times.issubset(run):
+                continue
+            wanted = [time for time in run if time not in times]
+            if all(time in available for time in wanted):
+                sets.append(
+                    (
+                        (first - start) / step,
+                        [(time, available[time]) for time in wanted],
+                    )
+                )
+
+    sets.sort(key=lambda s: s[0])
+    return sets
+
+
+def score_split_pairs(
+    slots: list[TimeSlot], booking_slot: ClubsparkBookingSlot, any_court: bool = False
+) -> list[tuple[float, list[tuple[int, ResourceSlot]]]]:
+    """
+    (score, [first hour, second hour]) for two back-to-back 60 minute sessions.
+
+    The second hour is on the same court where it's free, otherwise on a
+    neighbouring preferred court (any neighbour with any_court) for an extra
+    point. Pairs are scored on their first hour.
+    """
+    preferred = set(booking_slot.target_courts)
+    by_name = {(ts.Time, r.Name): r for ts in slots for r in ts.Resources}
+    by_number = {
+        (ts.Time, court_number(r.Name)): r
+        for ts in slots
+        for r in ts.Resources
+        if court_number(r.Name) is not None
+    }
+
+    pairs: list[tuple[float, list[tuple[int, ResourceSlot]]]] = []
+    for score, time, resource in score_slots(slots, booking_slot, any_court):
+        second = by_name.get((time + 60, resource.Name))
+        if second is None:
+            number = court_number(resource.Name)
+            neighbours = [] if number is None else [number - 1, number + 1]
+            for neighbour in neighbours:
+                if any_court or neighbour in preferred:
+                    second = by_number.get((time + 60, neighbour))
+                    if second is not None:
+                        score += 1
+                        break
+        if second is not None:
+            pairs.append((score, [(time, resource), (time + 60, second)]))
+
+    pairs.sort(key=lambda pair: (pair[0], pair[1][0][0]))
+    return pairs
+
+
+def score_split_completions(
+    slots: list[TimeSlot],
+    booking_slot: ClubsparkBookingSlot,
+    held: tuple[int, str],
+    first: bool,
+    any_court: bool = False,
+) -> list[tuple[float, tuple[int, ResourceSlot]]]:
+    """
+    (score, hour) for each 60 minute session that completes a split double.
+
+    held is the (time, court name) of the hour already booked, the first of
+    the two if first. The other hour is on the same court where it's free,
+    otherwise on a neighbouring preferred court (any neighbour with any_court)
+    for an extra point, as in score_split_pairs.
+    """
+    time, name = held
+    other = time + 60 if first else time - 60
+    preferred = set(booking_slot.target_courts)
+    resources = [r for ts in slots if ts.Time == other for r in ts.Resources]
+    number = court_number(name)
+    neighbours = [] if number is None else [number - 1, number + 1]
+
+    hours: list[tuple[float, tuple[int, ResourceSlot]]] = []
+    for resource in resources:
+        if resource.Name == name:
+            hours.append((0, (other, resource)))
+        elif court_number(resource.Name) in neighbours and (
+            any_court or court_number(resource.Name) in preferred
+        ):
+            hours.append((1, (other, resource)))
+
+    hours.sort(key=lambda hour: hour[0])
+    return hours
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points, in km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
 
 
 def index_rank(item: str | int, preferred_list: list[str] | list[int]) -> int | float:
@@ -0,0 +1,142 @@
+import datetime
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from app.bookers.clubspark.app_booker import AppBooker
+from app.bookers.clubspark.utils import timestr_to_int
+from app.core.config.app import VenueCheckConfig
+from app.core.config.clubspark import ClubsparkBookingSlot, ClubsparkConfig
+from app.core.metrics import metrics
+from app.models.clubspark_responses import AppSettingVenue
+
+LOGGER = logging.getLogger(__name__)
+
+
+class VenueCache:
+    """
+    GetAppSettings venue details per venue, persisted to a JSON file.
+
+    Scheduling reads from here and never from the network; refresh() fetches
+    the current settings and reports whether anything that affects scheduling
+    changed.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.venues: dict[str, AppSettingVenue] = {}
+        self.fetched_at: dict[str, float] = {}
+        # job id -> reason, from the most recent schedule
+        self.skipped: dict[str, str] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+            for slug, entry in data.items():
+                self.venues[slug] = AppSettingVenue.model_validate(entry["venue"])
+                self.fetched_at[slug] = entry["fetched_at"]
+        except Exception as e:
+            LOGGER.warning(f"Ignoring unreadable venue cache {self.path}: {e}")
+
+    def _save(self) -> None:
+        data = {
+            slug: {"fetched_at": self.fetched_at[slug], "venue": venue.model_dump()}
+            for slug, venue in self.venues.items()
+        }
+        self.path.write_text(json.dumps(data, separators=(",", ":")))
+
+    def get(self, slug: str) -> Optional[AppSettingVenue]:
+        return self.venues.get(slug)
+
+    def refresh(self, settings: ClubsparkConfig) -> bool:
+        """Fetch every target venue's settings, returning whether any changed."""
+        users = {slot.target_park: slot.user for slot in settings.booking_slots}
+        changed = False
+        for slug, user_id in users.items():
+            try:
+                booker = AppBooker(settings.get_user_by_id(user_id))
+                venue = booker.get_app_settings(slug).Venue
+            except Exception as e:
+                LOGGER.warning(f"Failed to refresh venue settings for {slug}: {e}")
+                continue
+
+            with self.lock:
+                previous = self.venues.get(slug)
+                changed |= previous is None or _schedule_fields(
+                    previous
+                ) != _schedule_fields(venue)
+                self.venues[slug] = venue
+                self.fetched_at[slug] = time.time()
+
+        with self.lock:
+            self._save()
+        return changed
+
+    def report(self, skipped: dict[str, str]) -> None:
+        """Record and log the jobs the latest schedule left out."""
+        new = {job_id: r for job_id, r in skipped.items() if job_id not in self.skipped}
+        self.skipped = skipped
+        for job_id, reason in new.items():
+            LOGGER.info("Not scheduling %s: %s", job_id, reason)
+            metrics.event("skipped_jobs", job=job_id, reason=reason)
+        if skipped:
+            LOGGER.info("Skipped %d jobs the venue can't honour", len(skipped))
+
+
+def _schedule_fields(venue: AppSettingVenue) -> tuple[Any, ...]:
+    return (
+        sorted(venue.ClosedDates),
+        venue.TimeZone,
+        venue.AdvancedBookingPeriod,
+        venue.OpeningTime,
+        venue.ClosingTime,
+    )
+
+
+def skip_reason(
+    venue: AppSettingVenue,
+    slot: ClubsparkBookingSlot,
+    date: datetime.date,
+    release_at: datetime.datetime,
+) -> Optional[str]:
+    """Why a booking job for slot on date can't succeed at this venue, if so."""
+    if date.isoformat() in {closed[:10] for closed in venue.ClosedDates}:
+        return f"{slot.target_park} is closed on {date}"
+
+    # AdvancedBookingPeriod is in days; bookings further out aren't open yet.
+    # Compare elapsed time, allowing a day for how the venue counts part days:
+    # a release at 22:00 seven days before midnight is within a 6-day period.
+    period = venue.AdvancedBookingPeriod
+    midnight = datetime.datetime.combine(date, datetime.time(0), release_at.tzinfo)
+    if period and midnight - release_at > datetime.timedelta(days=period + 1):
+        return (
+            f"{date} is beyond {slot.target_park}'s "
+            f"{period}-day booking window at {release_at}"
+        )
+
+    duration = 120 if slot.double_session else 60
+    opening, closing = venue.OpeningTime, venue.ClosingTime - duration
+    if not any(opening <= timestr_to_int(t) <= closing for t in slot.target_times):
+        return f"{slot.target_park} is not open for any of {slot.target_times}"
+
+    return None
+
+
+_venue_cache: Optional[VenueCache] = None
+
+
+def configure_venue_check(config: VenueCheckConfig) -> Optional[VenueCache]:
+    global _venue_cache
+    _venue_cache = VenueCache(config.path) if config.enabled else None
+    return _venue_cache
+
+
+def get_venue_cache() -> Optional[VenueCache]:
+    return _venue_cache
@@ -0,0 +1,250 @@
+import datetime
+import heapq
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.bookers.clubspark.app_booker import AppBooker
+from app.bookers.clubspark.utils import rank_slots
+from app.booking import run_booking
+from app.booking.clubspark import ClubsparkProvider
+from app.booking.pipeline import booked_state
+from app.core.config.app import WatcherConfig
+from app.core.config.clubspark import ClubsparkConfig
+from app.core.coordination import current_job
+from app.core.rate_limit import TokenBucket
+from app.core.release_times import release_time, resolve_timezone
+from app.core.scheduler import Scheduler
+from app.core.settings import get_settings
+from app.models.clubspark_responses import GetAvailabilityTimesResponse
+
+LOGGER = logging.getLogger(__name__)
+
+# (venue, date, duration): one availability request serves every slot on it
+PollKey = tuple[str, str, int]
+
+
+@dataclass
+class WatchTarget:
+    """A released, unbooked slot-date whose venue is polled for cancellations."""
+
+    slot_id: str
+    user_id: str
+    date: str
+
+    @property
+    def job_id(self) -> str:
+        # the release job's id, so the ledger and commit gate see one booking
+        return f"clubspark:{self.slot_id}:{self.date}"
+
+
+@dataclass
+class Poll:
+    targets: list[WatchTarget] = field(default_factory=list)
+    seen: Optional[set[tuple[int, str]]] = None
+
+
+def watch_targets(
+    settings: ClubsparkConfig,
+    timezone: str,
+    days_ahead: int,
+    settle_seconds: float,
+    now: Optional[datetime.datetime] = None,
+) -> dict[PollKey, list[WatchTarget]]:
+    """
+    Slot-dates within days_ahead that have been released but not booked.
+
+    A date is only watched settle_seconds after its release, once the release
+    job has given up, so the two never race for it.
+    """
+    settle = datetime.timedelta(seconds=settle_seconds)
+    targets: dict[PollKey, list[WatchTarget]] = {}
+    for slot in settings.booking_slots:
+        assert slot.id is not None
+        schedule = settings.get_rs_by_id(slot.target_park)
+        tz = resolve_timezone(schedule.timezone, timezone)
+        offset = datetime.timedelta(
+            days=schedule.days, hours=schedule.hours, minutes=schedule.minutes
+        )
+        current = now or datetime.datetime.now(tz)
+        today = current.astimezone(tz).date()
+
+        for i in range(days_ahead + 1):
+            day = today + datetime.timedelta(days=i)
+            if day.strftime("%A").lower() != slot.target_day:
+                continue
+            if release_time(day, offset, tz) + settle > current:
+                continue
+            target = WatchTarget(slot.id, slot.user, day.isoformat())
+            if booked_state(target.job_id, ClubsparkProvider.quantity(slot)):
+                continue
+            key = (slot.target_park, target.date, 120 if slot.double_session else 60)
+            targets.setdefault(key, []).append(target)
+    return targets
+
+
+def poll_interval(config: WatcherConfig, date: str, today: datetime.date) -> float:
+    """Poll faster as the play date approaches."""
+    days = (datetime.date.fromisoformat(date) - today).days
+    closeness = min(1.0, max(0.0, days / max(1, config.days_ahead)))
+    return config.min_interval_seconds + closeness * (
+        config.max_interval_seconds - config.min_interval_seconds
+    )
+
+
+def _available(response: GetAvailabilityTimesResponse) -> set[tuple[int, str]]:
+    return {(ts.Time, r.ID) for ts in response.Times for r in ts.Resources}
+
+
+class CancellationWatcher:
+    """
+    Polls released, unbooked slot-dates and books courts freed by cancellations.
+
+    Each (venue, date, duration) is one request however many slots watch it.
+    The first snapshot is the baseline; each later one is diffed against the
+    previous one, and only courts that newly appeared and match a slot's times
+    and courts fire its booking. Requests are
+    drawn from a single bucket of requests_per_minute; when that runs short the
+    most overdue poll goes first. Bookings run on scheduler's executor, so a
+    shutdown drains them with the scheduled jobs.
+    """
+
+    refresh_seconds = 60
+
+    def __init__(self, config: WatcherConfig, scheduler: Scheduler):
+        self.config = config
+        self.scheduler = scheduler
+        self.bucket = TokenBucket(config.requests_per_minute / 60, 1)
+        self.polls: dict[PollKey, Poll] = {}
+        self.due: list[tuple[float, PollKey]] = []
+        self.firing: set[str] = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, name="watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop polling; bookings already fired are left to the scheduler."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def refresh(self) -> None:
+        """Pick up config edits, new releases and bookings made since last time."""
+        settings = get_settings()
+        targets = watch_targets(
+            settings.clubspark,
+            settings.app.timezone,
+            self.config.days_ahead,
+            settings.app.retry.window_seconds,
+        )
+        now = time.monotonic()
+        for key, key_targets in targets.items():
+            poll = self.polls.get(key)
+            if poll is None:
+                poll = self.polls[key] = Poll()
+                heapq.heappush(self.due, (now, key))
+            poll.targets = key_targets
+        for key in set(self.polls) - set(targets):
+            del self.polls[key]
+        LOGGER.debug("Watching %d venue-dates", len(self.polls))
+
+    def run(self) -> None:
+        refreshed = 0.0
+        while not self.stop_event.is_set():
+            if time.monotonic() - refreshed > self.refresh_seconds:
+                try:
+                    self.refresh()
+                except Exception:
+                    LOGGER.exception("Failed to refresh watch targets")
+                refreshed = time.monotonic()
+
+            # drop entries for venue-dates no longer watched
+            while self.due and self.due[0][1] not in self.polls:
+                heapq.heappop(self.due)
+            if not self.due:
+                self.stop_event.wait(self.refresh_seconds)
+                refreshed = 0.0
+                continue
+
+            due_at, key = self.due[0]
+            wait = due_at - time.monotonic()
+            if wait > 0:
+                self.stop_event.wait(min(wait, self.refresh_seconds))
+                continue
+
+            heapq.heappop(self.due)
+            self.stop_event.wait(self.bucket.reserve())
+            self.poll(key)
+            today = datetime.date.today()
+            heapq.heappush(
+                self.due,
+                (time.monotonic() + poll_interval(self.config, key[1], today), key),
+            )
+
+    def poll(self, key: PollKey) -> None:
+        poll = self.polls[key]
+        venue, date, duration = key
+        settings = get_settings()
+        try:
+            user = settings.clubspark.get_user_by_id(poll.targets[0].user_id)
+            response = AppBooker(user).get_availability_times(
+                venue_slug=venue, date=date, duration=duration
+            )
+        except Exception as e:
+            LOGGER.warning(f"Failed to poll {venue} on {date}: {e}")
+            return
+
+        available = _available(response)
+        if poll.seen is None:
+            # the first poll can't tell freed courts from ones the release job passed over
+            poll.seen = available
+            return
+        appeared = available - poll.seen
+        poll.seen = available
+        if not appeared:
+            return
+
+        LOGGER.info("%d courts appeared at %s on %s", len(appeared), venue, date)
+        fresh = [
+            ts.model_copy(
+                update={
+                    "Resources": [
+                        r for r in ts.Resources if (ts.Time, r.ID) in appeared
+                    ]
+                }
+            )
+            for ts in response.Times
+        ]
+        for target in poll.targets:
+            slot = settings.clubspark.get_bs_by_id(target.slot_id)
+            if rank_slots(fresh, slot):
+                self.fire(target)
+
+    def fire(self, target: WatchTarget) -> None:
+        """Run the booking for target on the scheduler, once at a time."""
+        with self.lock:
+            if target.job_id in self.firing:
+                return
+            self.firing.add(target.job_id)
+        try:
+            self.scheduler.run_now(f"watch:{target.job_id}", self.book, [target])
+        except Exception:
+            LOGGER.exception(f"Failed to start booking {target.job_id}")
+            with self.lock:
+                self.firing.discard(target.job_id)
+
+    def book(self, target: WatchTarget) -> None:
+        token = current_job.set(target.job_id)
+        try:
+            LOGGER.info("Booking %s for %s", target.slot_id, target.date)
+            run_booking("clubspark", target.user_id, target.slot_id, target.date)
+        finally:
+            current_job.reset(token)
+            with self.lock:
+                self.firing.discard(target.job_id)
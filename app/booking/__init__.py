@@ -0,0 +1,33 @@
+import logging
+from typing import Callable
+
+from app.booking.clubspark import make_clubspark_booking
+from app.core.settings import get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+booking_actions: dict[str, Callable[..., None]] = {
+    "clubspark": make_clubspark_booking,
+}
+
+
+def run_booking(provider: str, user_id: str, slot_id: str, date: str) -> None:
+    """
+    Scheduled entry point for a booking job.
+
+    Jobs only carry ids; the user and slot are looked up in the live config
+    when the job fires. A slot that has since been removed, or edited without
+    an explicit id, is skipped.
+    """
+    provider_config = getattr(get_settings(), provider)
+    user = provider_config.get_user_by_id(user_id)
+    try:
+        booking_slot = provider_config.get_bs_by_id(slot_id)
+    except ValueError:
+        LOGGER.error(
+            "Booking slot %s for %s is no longer in the config - skipping",
+            slot_id,
+            date,
+        )
+        return
+    booking_actions[provider](user, booking_slot, date)
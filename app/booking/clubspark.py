@@ -1,120 +1,453 @@
 import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Optional
 
 from app.bookers.clubspark.app_booker import AppBooker
 from app.bookers.clubspark.stripe_manager import StripeManager
-from app.bookers.clubspark.utils import rank_slots
+from app.bookers.clubspark.utils import (
+    distance_km,
+    score_completions,
+    score_sets,
+    score_split_completions,
+    score_split_pairs,
+)
+from app.booking.pipeline import BookingJob, Candidate, Provider, run_pipeline
 from app.core.config.clubspark import ClubsparkBookingSlot, ClubsparkUserConfig
-from app.core.settings import settings
-from app.tasks.emails import send_email
+from app.core.errors import ConflictError
+from app.core.ledger import AttemptRecord
+from app.models.clubspark_responses import (
+    AppSettingsResponse,
+    CreatePaymentResponse,
+    GetAvailabilityTimesResponse,
+    GetVenueCreditResponse,
+    ResourceSlot,
+)
+from app.models.stripe import PaymentMethodResponse
 
 LOGGER = logging.getLogger(__name__)
 
+Fetched = dict[str, tuple[GetAvailabilityTimesResponse, AppSettingsResponse]]
+# start time, resource and duration of one session
+Member = tuple[int, ResourceSlot, int]
 
-def make_clubspark_booking(
-    user: ClubsparkUserConfig, booking_slot: ClubsparkBookingSlot, date: str
-) -> None:
-    try:
-        _make_clubspark_booking(user, booking_slot, date)
-
-    except Exception as e:
-        print(f"Error occurred while making booking: {e}")
-        if settings.app.emails_enabled:
-            send_email(
-                f"Failed to book {booking_slot.target_park} on {date}",
-                f"Error occurred while making booking: {e}",
-                user.email,
+# payment id recorded in the ledger for sessions paid from venue credit
+CREDIT = "credit"
+
+
+class ClubsparkProvider(Provider[ClubsparkUserConfig, ClubsparkBookingSlot]):
+    """Clubspark courts, paid for by card through each venue's Stripe account."""
+
+    name = "clubspark"
+
+    def __init__(
+        self,
+        user: ClubsparkUserConfig,
+        booking_slot: ClubsparkBookingSlot,
+        date: str,
+        job: BookingJob,
+    ):
+        super().__init__(user, booking_slot, date, job)
+        self.booker = AppBooker(user)
+        self.stripe = StripeManager()
+        job.refresh_auth = self.booker.token_manager.force_refresh
+        self.duration = 120 if booking_slot.double_session else 60
+        self.split = self.splits_double(booking_slot)
+        self.fetched: Fetched = {}
+        # 60 minute availability per venue, for splitting a double session
+        self.singles: dict[str, GetAvailabilityTimesResponse] = {}
+        # payment methods belong to a venue's Stripe account, so make them as needed
+        self.payment_methods: dict[str, PaymentMethodResponse] = {}
+        self.payment_methods_lock = threading.Lock()
+        # prepaid credit left per venue, spent as members are reserved
+        self.credit_futures: dict[str, Future[GetVenueCreditResponse]] = {}
+        self.credits: dict[str, float] = {}
+        # venues whose credit was turned down, paid by card from then on
+        self.credit_refused: set[str] = set()
+        self.credits_lock = threading.Lock()
+
+    @classmethod
+    def job_key(
+        cls, user: ClubsparkUserConfig, booking_slot: ClubsparkBookingSlot, date: str
+    ) -> str:
+        return (
+            f"clubspark:{user.id}-{booking_slot.target_park}-"
+            f"{booking_slot.target_day}:{date}"
+        )
+
+    @staticmethod
+    def splits_double(booking_slot: ClubsparkBookingSlot) -> bool:
+        return (
+            booking_slot.double_session
+            and booking_slot.split_double
+            and booking_slot.quantity == 1
+        )
+
+    @classmethod
+    def quantity(cls, booking_slot: ClubsparkBookingSlot) -> int:
+        return 2 if cls.splits_double(booking_slot) else booking_slot.quantity
+
+    @classmethod
+    def target(cls, booking_slot: ClubsparkBookingSlot) -> str:
+        return booking_slot.target_park
+
+    def prepare(self) -> None:
+        self.current_user_future = self.job.submit(self.booker.get_current_user)
+
+    def _fetch_venue(
+        self, venue: str
+    ) -> tuple["Future[GetAvailabilityTimesResponse]", "Future[AppSettingsResponse]"]:
+        if self.user.pay_with_credit:
+            self.credit_futures[venue] = self.job.submit(
+                self.booker.get_venue_credit, venue
+            )
+        if self.split:
+            self.single_futures[venue] = self.job.submit(
+                self.booker.get_availability_times,
+                venue_slug=venue,
+                date=self.date,
+                duration=60,
             )
-        else:
-            LOGGER.info("Suppressing email send")
+        return (
+            self.job.submit(
+                self.booker.get_availability_times,
+                venue_slug=venue,
+                date=self.date,
+                duration=self.duration,
+            ),
+            self.job.submit(self.booker.get_app_settings, venue),
+        )
 
+    def poll(self) -> Fetched:
+        """Every candidate venue's availability and settings, in parallel."""
+        booking_slot = self.booking_slot
+        target_park = booking_slot.target_park
+        venues = [target_park] + [
+            p for p in booking_slot.fallback_parks if p != target_park
+        ]
+        self.single_futures: dict[str, Future[GetAvailabilityTimesResponse]] = {}
+        user_venues_future = (
+            self.job.submit(self.booker.get_user_venues)
+            if booking_slot.fallback_radius_km is not None
+            else None
+        )
+        fetches = {venue: self._fetch_venue(venue) for venue in venues}
 
-def _make_clubspark_booking(
-    user: ClubsparkUserConfig, booking_slot: ClubsparkBookingSlot, date: str
-) -> None:
-    booker = AppBooker(user)
-    stripe = StripeManager()
-    current_user = booker.get_current_user()
-    duration = 120 if booking_slot.double_session else 60
+        if user_venues_future is not None:
+            try:
+                origin = fetches[target_park][1].result().Venue
+                for venue in user_venues_future.result().Venues:
+                    km = distance_km(
+                        origin.Latitude,
+                        origin.Longitude,
+                        venue.Latitude,
+                        venue.Longitude,
+                    )
+                    if (
+                        venue.UrlSegment not in fetches
+                        and km <= booking_slot.fallback_radius_km
+                    ):
+                        fetches[venue.UrlSegment] = self._fetch_venue(venue.UrlSegment)
+            except Exception as e:
+                LOGGER.warning("Failed to find venues near %s: %s", target_park, e)
 
-    available_slots = booker.get_availability_times(
-        venue_slug=booking_slot.target_park, date=date, duration=duration
-    )
+        self.current_user = self.current_user_future.result()
+        fetched: Fetched = {}
+        for venue, (availability, venue_settings) in fetches.items():
+            try:
+                fetched[venue] = (availability.result(), venue_settings.result())
+            except Exception as e:
+                if venue == target_park and len(fetches) == 1:
+                    raise
+                LOGGER.warning("Failed to fetch availability at %s: %s", venue, e)
+
+        if not fetched:
+            raise ValueError("Failed to fetch availability at every candidate venue")
+
+        for venue, credit in self.credit_futures.items():
+            if venue not in fetched:
+                continue
+            try:
+                self.credits[venue] = credit.result().amount
+            except Exception as e:
+                LOGGER.warning("Failed to fetch venue credit at %s: %s", venue, e)
+        if self.credits:
+            LOGGER.info("Venue credit: %s", self.credits)
+
+        for venue, single in self.single_futures.items():
+            if venue not in fetched:
+                continue
+            try:
+                self.singles[venue] = single.result()
+            except Exception as e:
+                LOGGER.warning("Failed to fetch single sessions at %s: %s", venue, e)
+
+        available = sum(
+            len(availability.Times) for availability, _ in fetched.values()
+        ) + sum(len(single.Times) for single in self.singles.values())
+        if available == 0:
+            raise ValueError("There are no available slots for the requested date")
+        LOGGER.info("%d available times across %d venues", available, len(fetched))
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            for venue, (availability, venue_settings) in fetched.items():
+                LOGGER.debug("Venue Settings: %s", venue_settings)
+                for slot in availability.Times:
+                    LOGGER.debug("    %s %s", venue, slot)
+
+        self.fetched = fetched
+        return fetched
+
+    def rank(self, polled: Fetched) -> list[Candidate]:
+        candidates = _rank_venues(self.booking_slot, polled, self.duration)
+        if self.singles:
+            # two single sessions only once every double session is gone
+            candidates += _rank_split_pairs(self.booking_slot, polled, self.singles)
+        return candidates
+
+    def complete(
+        self, polled: Fetched, held: dict[int, dict[str, Any]]
+    ) -> list[Candidate]:
+        """The missing members of a partly booked set, next to the held ones."""
+        venues = {ref["venue"] for ref in held.values()}
+        if len(venues) != 1:
+            return []
+        venue = venues.pop()
+        if self.split:
+            return self._complete_split(venue, held)
+        if venue not in polled or any(
+            ref["duration"] != self.duration for ref in held.values()
+        ):
+            return []
+        missing = [i for i in range(self.booking_slot.quantity) if i not in held]
+        return [
+            Candidate(
+                venue,
+                [(time, resource, self.duration) for time, resource in members],
+                missing,
+            )
+            for _, members in score_completions(
+                polled[venue][0].Times,
+                self.booking_slot,
+                [(ref["time"], ref["court"]) for ref in held.values()],
+                any_court=venue != self.booking_slot.target_park,
+            )
+        ]
+
+    def _complete_split(
+        self, venue: str, held: dict[int, dict[str, Any]]
+    ) -> list[Candidate]:
+        """The other hour of a split double, never a 2 hour block on top."""
+        if venue not in self.singles or len(held) != 1:
+            return []
+        [(index, ref)] = held.items()
+        return [
+            Candidate(venue, [(time, resource, 60)], [1 - index])
+            for _, (time, resource) in score_split_completions(
+                self.singles[venue].Times,
+                self.booking_slot,
+                (ref["time"], ref["court"]),
+                first=index == 0,
+                any_court=venue != self.booking_slot.target_park,
+            )
+        ]
+
+    def payment_method_for(
+        self, venue_settings: AppSettingsResponse
+    ) -> PaymentMethodResponse:
+        account = venue_settings.Venue.StripeAccountID
+        with self.payment_methods_lock:
+            if account not in self.payment_methods:
+                card_month, card_year = self.user.card_expiry.split("/")
+                with self.job.stopwatch.stage("payment_method"):
+                    self.payment_methods[account] = self.job.call(
+                        self.stripe.payment_method,
+                        stripe_account=account,
+                        stripe_key=venue_settings.StripePublishableKey,
+                        card_number=self.user.card_number,
+                        card_exp_year=str(int(card_year)),
+                        card_exp_month=str(int(card_month)),
+                        card_cvc=self.user.card_cvc,
+                        email=self.current_user.EmailAddress,
+                    )
+                LOGGER.debug(
+                    "Created Payment Method: %s", self.payment_methods[account]
+                )
+            return self.payment_methods[account]
+
+    def _credit_covers(self, venue: str, cost: float) -> bool:
+        """Whether the user pays cost from the venue's fetched credit."""
+        balance = self.credits.get(venue)
+        return (
+            self.user.pay_with_credit
+            and cost > 0
+            and venue not in self.credit_refused
+            and balance is not None
+            and balance >= cost
+        )
 
-    if len(available_slots.Times) == 0:
-        raise ValueError("There are no available slots for the requested date")
-    LOGGER.info("Available Slots:")
-    for slot in available_slots.Times:
-        LOGGER.info(f"    {slot}")
+    def _claim_credit(self, venue: str, cost: float) -> bool:
+        with self.credits_lock:
+            if not self._credit_covers(venue, cost):
+                return False
+            self.credits[venue] = self.credits.get(venue, 0.0) - cost
+            return True
 
-    ranked_slots = rank_slots(available_slots.Times, booking_slot)
+    def warm(self, candidate: Candidate) -> None:
+        cost = sum(resource.Cost for _, resource, _ in candidate.members)
+        if not self._credit_covers(candidate.venue, cost):
+            self.payment_method_for(self.fetched[candidate.venue][1])
 
-    if len(ranked_slots) == 0:
-        raise ValueError(
-            "There are no available slots that meet the requested times/courts"
+    def pay(
+        self, venue: str, member: Member, attempt: AttemptRecord
+    ) -> Optional[CreatePaymentResponse]:
+        """The card payment for member, or None if venue credit covers it."""
+        _, resource, _ = member
+        if self._claim_credit(venue, resource.Cost):
+            LOGGER.info("Paying %s from venue credit", resource.Cost)
+            return None
+
+        venue_settings = self.fetched[venue][1]
+        payment_method = self.payment_method_for(venue_settings)
+        payment = self.booker.create_payment(
+            self.current_user.FirstName + " " + self.current_user.LastName,
+            cost=resource.Cost,
+            payment_method_id=payment_method.id,
+            scope=resource.SessionID,
+            venue_id=venue_settings.Venue.ID,
+        )
+
+        LOGGER.info("Payment made: %s", payment.ID)
+        LOGGER.debug("Payment: %s", payment)
+        if payment.ID is None:
+            raise ConflictError(f"Error during payment creation: {payment.Error}")
+        attempt.payment_id = payment.ID
+        return payment
+
+    def reserve(
+        self,
+        venue: str,
+        member: Member,
+        payment: Optional[CreatePaymentResponse],
+        attempt: AttemptRecord,
+    ) -> None:
+        time, resource, duration = member
+        booked_session = self.booker.request_session(
+            venue_slug=venue,
+            payment_token=payment.ID if payment is not None else "",
+            duration=duration,
+            date=self.date,
+            total_paid=resource.Cost,
+            start_time=time,
+            resource_id=resource.ID,
+            session_id=resource.SessionID,
+            credits_applied=resource.Cost if payment is None else 0,
         )
-    LOGGER.info("Ranked Slots:")
-    for slot in ranked_slots:
-        LOGGER.info(f"    {slot}")
-
-    venue_settings = booker.get_app_settings(booking_slot.target_park)
-
-    LOGGER.info("Venue Settings:")
-    LOGGER.info(venue_settings)
-
-    card_month, card_year = user.card_expiry.split("/")
-    payment_method = stripe.payment_method(
-        stripe_account=venue_settings.Venue.StripeAccountID,
-        stripe_key=venue_settings.StripePublishableKey,
-        card_number=user.card_number,
-        card_exp_year=str(int(card_year)),
-        card_exp_month=str(int(card_month)),
-        card_cvc=user.card_cvc,
-        email=current_user.EmailAddress,
+
+        LOGGER.info("Booked session result: %s", booked_session.Result)
+        LOGGER.debug("Booked session: %s", booked_session)
+        attempt.session_result = booked_session.Result
+        if payment is None and booked_session.Result >= 0:
+            # nothing is spent until the session is, so only record it then
+            attempt.payment_id = CREDIT
+
+        if booked_session.Result < 0:
+            if payment is None:
+                # the credit may not be what it seemed, so pay by card from here on
+                with self.credits_lock:
+                    self.credit_refused.add(venue)
+            raise ConflictError("Error reserving session after payment")
+
+    def release(
+        self, venue: str, member: Member, payment: Optional[CreatePaymentResponse]
+    ) -> None:
+        if payment is None:
+            _, resource, _ = member
+            with self.credits_lock:
+                self.credits[venue] = self.credits.get(venue, 0.0) + resource.Cost
+
+    def member_ref(self, venue: str, member: Member) -> dict[str, Any]:
+        time, resource, duration = member
+        return {
+            "venue": venue,
+            "time": time,
+            "court": resource.Name,
+            "duration": duration,
+        }
+
+    def describe(self, venue: str, member: Member) -> str:
+        time, resource, duration = member
+        description = f"{time} {resource.Name}"
+        if duration != self.duration:
+            description += f" ({duration} min)"
+        if venue == self.booking_slot.target_park:
+            return description
+        return f"{venue} {description}"
+
+
+def make_clubspark_booking(
+    user: ClubsparkUserConfig, booking_slot: ClubsparkBookingSlot, date: str
+) -> None:
+    run_pipeline(ClubsparkProvider, user, booking_slot, date)
+
+
+def _venue_km(
+    booking_slot: ClubsparkBookingSlot, fetched: Fetched, venue: str
+) -> float:
+    """Distance from target_park to venue, or 0 if either is unknown."""
+    target_park = booking_slot.target_park
+    if venue == target_park or target_park not in fetched or venue not in fetched:
+        return 0.0
+    origin = fetched[target_park][1].Venue
+    destination = fetched[venue][1].Venue
+    return distance_km(
+        origin.Latitude, origin.Longitude, destination.Latitude, destination.Longitude
     )
 
-    LOGGER.info("Created Payment Method:")
-    LOGGER.info(payment_method)
-
-    retry_cap = 3
-    for i, (time, resource) in enumerate(ranked_slots):
-        i += 1
-        if i > retry_cap:
-            LOGGER.info("Hit retry cap - exiting")
-            return
-
-        LOGGER.info("Attempting to book slot:")
-        LOGGER.info(f"{time}, {resource}")
-        try:
-            payment = booker.create_payment(
-                current_user.FirstName + " " + current_user.LastName,
-                cost=resource.Cost,
-                payment_method_id=payment_method.id,
-                scope=resource.SessionID,
-                venue_id=venue_settings.Venue.ID,
-            )
 
-            LOGGER.info("Payment Made:")
-            LOGGER.info(payment)
-            if payment.ID is None:
-                raise ValueError("Error during payment creation")
-
-            booked_session = booker.request_session(
-                venue_slug=booking_slot.target_park,
-                payment_token=payment.ID,
-                duration=duration,
-                date=date,
-                total_paid=resource.Cost,
-                start_time=time,
-                resource_id=resource.ID,
-                session_id=resource.SessionID,
+def _rank_venues(
+    booking_slot: ClubsparkBookingSlot, fetched: Fetched, duration: int
+) -> list[Candidate]:
+    """
+    Candidates across venues, best first.
+
+    Each venue's sets of booking_slot.quantity resources are scored on time and
+    court as usual, plus distance_weight per km from target_park.
+    """
+    scored: list[tuple[float, float, Candidate]] = []
+    for venue, (availability, _) in fetched.items():
+        km = _venue_km(booking_slot, fetched, venue)
+        for score, members in score_sets(
+            availability.Times,
+            booking_slot,
+            any_court=venue != booking_slot.target_park,
+        ):
+            candidate = Candidate(
+                venue, [(time, resource, duration) for time, resource in members]
             )
+            scored.append((score + booking_slot.distance_weight * km, km, candidate))
 
-            LOGGER.info("Booked session:")
-            LOGGER.info(booked_session)
+    scored.sort(key=lambda candidate: candidate[:2])
+    return [candidate for _, _, candidate in scored]
+
+
+def _rank_split_pairs(
+    booking_slot: ClubsparkBookingSlot,
+    fetched: Fetched,
+    singles: dict[str, GetAvailabilityTimesResponse],
+) -> list[Candidate]:
+    """Back-to-back pairs of 60 minute sessions across venues, best first."""
+    scored: list[tuple[float, float, Candidate]] = []
+    for venue, availability in singles.items():
+        km = _venue_km(booking_slot, fetched, venue)
+        for score, members in score_split_pairs(
+            availability.Times,
+            booking_slot,
+            any_court=venue != booking_slot.target_park,
+        ):
+            candidate = Candidate(
+                venue, [(time, resource, 60) for time, resource in members]
+            )
+            scored.append((score + booking_slot.distance_weight * km, km, candidate))
 
-            if booked_session.Result < 0:
-                raise ValueError("Error reserving session after payment")
-            else:
-                return
-        except Exception as e:
-            LOGGER.error(f"Error occurred while booking session: {e}")
+    scored.sort(key=lambda candidate: candidate[:2])
+    return [candidate for _, _, candidate in scored]
@@ -0,0 +1,460 @@
+import contextvars
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Callable, ClassVar, Generic, Optional, TypeVar
+
+from app.core.config.base import B, U
+from app.core.coordination import JobAlreadyCommitted, commit_gate, current_job
+from app.core.ledger import (
+    BOOKED,
+    AlreadyBooked,
+    AttemptRecord,
+    PaidNotBooked,
+    Stopwatch,
+    already_booked,
+    booked_detail,
+    ledger_attempt,
+    record_attempt,
+)
+from app.core.metrics import metrics
+from app.core.profiling import profiled
+from app.core.rate_limit import RELEASE, request_budget
+from app.core.retry import DeadlineExceeded, RetryPolicy, may_have_landed
+from app.core.settings import get_settings
+from app.tasks.emails import send_email
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# concurrent lookups (availability, settings, user details) per job
+FETCH_WORKERS = 8
+
+
+def submit(
+    pool: ThreadPoolExecutor, fn: Callable[..., T], *args: Any, **kwargs: Any
+) -> "Future[T]":
+    # pool threads don't inherit context vars, so carry the budget and job over
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def member_key(idempotency_key: str, index: int) -> str:
+    """Ledger key for one resource of a multi-resource booking."""
+    return f"{idempotency_key}#{index}"
+
+
+def booked_state(idempotency_key: str, quantity: int) -> Optional[str]:
+    """
+    The ledger state that should stop a rerun of a job, if any.
+
+    Sets are held under a key per member, so a set counts once every member's
+    key is held.
+    """
+    state = already_booked(idempotency_key)
+    if state is None and quantity > 1:
+        states = [
+            already_booked(member_key(idempotency_key, i)) for i in range(quantity)
+        ]
+        state = states[0] if all(s is not None for s in states) else None
+    return state
+
+
+def held_members(idempotency_key: str, quantity: int) -> dict[int, Any]:
+    """
+    Index to member_ref of each booked member of a set.
+
+    Raises AlreadyBooked if a member is pending or paid but not booked, as
+    the set can't safely be completed then.
+    """
+    held: dict[int, Any] = {}
+    for i in range(quantity):
+        key = member_key(idempotency_key, i)
+        state = already_booked(key)
+        if state == BOOKED:
+            held[i] = booked_detail(key)
+        elif state is not None:
+            raise AlreadyBooked(f"{key} is {state} in the ledger")
+    return held
+
+
+@dataclass
+class Candidate:
+    """
+    Resources at one venue to book together, one member per resource.
+
+    indices are the set positions the members fill, when completing a partly
+    booked set; otherwise member i is position i.
+    """
+
+    venue: str
+    members: list[Any]
+    indices: Optional[list[int]] = None
+
+
+class BookingJob:
+    """
+    What the pipeline shares with a provider for one booking job.
+
+    call and submit run a request under the job's retry policy, refreshing the
+    provider's auth when the policy asks for it; submit runs it on the job's
+    pool. Stages timed on the stopwatch end up in the ledger and metrics.
+    """
+
+    def __init__(
+        self,
+        idempotency_key: str,
+        pool: ThreadPoolExecutor,
+        policy: RetryPolicy,
+        stopwatch: Stopwatch,
+    ):
+        self.idempotency_key = idempotency_key
+        self.pool = pool
+        self.policy = policy
+        self.stopwatch = stopwatch
+        self.refresh_auth: Optional[Callable[[], object]] = None
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return self.policy.call(fn, *args, refresh_auth=self.refresh_auth, **kwargs)
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        return submit(self.pool, self.call, profiled(fn), *args, **kwargs)
+
+
+class Provider(ABC, Generic[U, B]):
+    """
+    A provider's stages of the booking pipeline.
+
+    One instance per booking job. The pipeline runs prepare and poll, ranks
+    what poll returned, then pays for and reserves each member of the best
+    candidate it can get. Requests should go through job.call or job.submit,
+    except in pay and reserve, which the pipeline retries one at a time.
+    """
+
+    name: ClassVar[str]
+
+    def __init__(self, user: U, booking_slot: B, date: str, job: BookingJob):
+        self.user = user
+        self.booking_slot = booking_slot
+        self.date = date
+        self.job = job
+
+    @classmethod
+    def job_key(cls, user: U, booking_slot: B, date: str) -> str:
+        """Idempotency key for a booking run outside a scheduled job."""
+        return f"{cls.name}:{user.id}-{booking_slot.id}:{date}"
+
+    @classmethod
+    def quantity(cls, booking_slot: B) -> int:
+        """The most resources a candidate can hold."""
+        return getattr(booking_slot, "quantity", 1)
+
+    @classmethod
+    def target(cls, booking_slot: B) -> str:
+        """What is being booked, for logs, metrics and emails."""
+        return booking_slot.id or ""
+
+    def prepare(self) -> None:
+        """Log in, and start any lookups that poll doesn't depend on."""
+
+    @abstractmethod
+    def poll(self) -> Any:
+        """Fetch availability for every venue worth trying."""
+
+    @abstractmethod
+    def rank(self, polled: Any) -> list[Candidate]:
+        """Candidates from what poll returned, best first."""
+
+    def complete(self, polled: Any, held: dict[int, Any]) -> list[Candidate]:
+        """
+        Candidates that fill the missing positions of a partly booked set.
+
+        held maps each booked position to its member_ref. The default can't
+        complete sets, so a partly booked one is left as it is.
+        """
+        return []
+
+    def warm(self, candidate: Candidate) -> None:
+        """Get ready to pay for candidate, before the first attempt."""
+
+    @abstractmethod
+    def pay(self, venue: str, member: Any, attempt: AttemptRecord) -> Any:
+        """Pay for member, returning what reserve needs."""
+
+    @abstractmethod
+    def reserve(
+        self, venue: str, member: Any, payment: Any, attempt: AttemptRecord
+    ) -> None:
+        """Reserve member with payment, raising if it isn't held."""
+
+    def release(self, venue: str, member: Any, payment: Any) -> None:
+        """Give back whatever pay set aside, once member can't be reserved."""
+
+    def describe(self, venue: str, member: Any) -> str:
+        return f"{venue} {member}"
+
+    def member_ref(self, venue: str, member: Any) -> Optional[dict[str, Any]]:
+        """What a booked member holds, kept in the ledger for complete."""
+        return None
+
+    def notify(self, subject: str, body: str) -> None:
+        if get_settings().app.emails_enabled:
+            send_email(subject, body, getattr(self.user, "email", None))
+        else:
+            LOGGER.info("Suppressing email send")
+
+
+def run_pipeline(
+    provider_cls: type[Provider[U, B]], user: U, booking_slot: B, date: str
+) -> None:
+    """
+    Book booking_slot on date for user with provider_cls.
+
+    Skips jobs the ledger already has booked, and only tries to complete a
+    set that is partly booked. Records failures in the ledger, emails the user
+    about failures and partial bookings, and reports the outcome to metrics.
+    """
+    idempotency_key = current_job.get() or provider_cls.job_key(
+        user, booking_slot, date
+    )
+    quantity = provider_cls.quantity(booking_slot)
+    state = booked_state(idempotency_key, quantity)
+    if state is not None:
+        LOGGER.info(f"{idempotency_key} is already {state} in the ledger - skipping")
+        return
+    held: dict[int, Any] = {}
+    if quantity > 1:
+        try:
+            held = held_members(idempotency_key, quantity)
+        except AlreadyBooked as e:
+            LOGGER.info(f"{e} - skipping")
+            return
+        if any(ref is None for ref in held.values()):
+            LOGGER.warning(
+                f"{idempotency_key} is partly booked, but the ledger doesn't say "
+                "what with - not re-attempting"
+            )
+            return
+        if held:
+            LOGGER.info(
+                f"{idempotency_key} has {len(held)} of {quantity} booked, "
+                "completing the set"
+            )
+
+    target = provider_cls.target(booking_slot)
+    started = perf_counter()
+    outcome = "error"
+    provider: Optional[Provider[U, B]] = None
+    try:
+        with (
+            request_budget(RELEASE),
+            ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool,
+        ):
+            job = BookingJob(
+                idempotency_key,
+                pool,
+                RetryPolicy(get_settings().app.retry),
+                Stopwatch(),
+            )
+            provider = provider_cls(user, booking_slot, date, job)
+            outcome = _run(provider, job, held)
+        if outcome == "partial":
+            provider.notify(
+                f"Partly booked {target} on {date}",
+                f"Only some of the {quantity} resources could be booked",
+            )
+
+    except Exception as e:
+        LOGGER.error("Error occurred while making booking: %s", e)
+        record_attempt(
+            AttemptRecord(
+                idempotency_key=idempotency_key,
+                provider=provider_cls.name,
+                user_id=user.id,
+                date=date,
+                job_id=current_job.get(),
+                error=repr(e),
+            )
+        )
+        if provider is not None:
+            provider.notify(
+                f"Failed to book {target} on {date}",
+                f"Error occurred while making booking: {e}",
+            )
+
+    finally:
+        _record_outcome(
+            provider_cls.name, idempotency_key, target, date, outcome, started
+        )
+
+
+def _record_outcome(
+    provider: str,
+    idempotency_key: str,
+    target: str,
+    date: str,
+    outcome: str,
+    started: float,
+) -> None:
+    elapsed_ms = (perf_counter() - started) * 1000
+    metrics.inc("bookings_total", provider=provider, outcome=outcome)
+    metrics.observe("booking_duration_ms", elapsed_ms, provider=provider)
+    metrics.event(
+        "bookings",
+        job=idempotency_key,
+        venue=target,
+        date=date,
+        outcome=outcome,
+        elapsed_ms=round(elapsed_ms, 1),
+    )
+
+
+def _run(provider: Provider[Any, Any], job: BookingJob, held: dict[int, Any]) -> str:
+    """Book the best available candidate, returning the outcome."""
+    with job.stopwatch.stage("poll"):
+        provider.prepare()
+        polled = provider.poll()
+
+    with job.stopwatch.stage("rank"):
+        if held:
+            candidates = provider.complete(polled, held)
+        else:
+            candidates = provider.rank(polled)
+
+    if len(candidates) == 0 and held:
+        LOGGER.info("Nothing available completes the set - leaving it partly booked")
+        return "skipped"
+    if len(candidates) == 0:
+        raise ValueError(
+            "There are no available slots that meet the requested times/courts"
+        )
+    LOGGER.info("%d ranked candidates, best: %s", len(candidates), candidates[0])
+    if LOGGER.isEnabledFor(logging.DEBUG):
+        for candidate in candidates:
+            LOGGER.debug("    %s", candidate)
+
+    provider.warm(candidates[0])
+
+    for candidate in candidates:
+        LOGGER.info(
+            "Attempting to book %s",
+            ", ".join(
+                provider.describe(candidate.venue, member)
+                for member in candidate.members
+            ),
+        )
+        try:
+            if len(candidate.members) == 1 and candidate.indices is None:
+                _book_one(provider, job, candidate)
+                return "booked"
+            booked = _book_set(provider, job, candidate)
+            if booked < len(candidate.members):
+                LOGGER.warning(
+                    "Booked %d of %d resources", booked, len(candidate.members)
+                )
+                return "partial"
+            return "booked"
+        except (JobAlreadyCommitted, AlreadyBooked) as e:
+            LOGGER.info("Skipping booking: %s", e)
+            return "skipped"
+        except DeadlineExceeded:
+            LOGGER.info("Release window has passed - exiting")
+            return "deadline"
+        except Exception as e:
+            if may_have_landed(e) or isinstance(e, PaidNotBooked):
+                # another candidate could leave two sessions booked or paid for
+                raise
+            LOGGER.error("Error occurred while booking session: %s", e)
+
+    return "exhausted"
+
+
+def _pay_and_reserve(
+    provider: Provider[Any, Any],
+    job: BookingJob,
+    venue: str,
+    member: Any,
+    key: str,
+    stopwatch: Stopwatch,
+) -> None:
+    """
+    Pay for member, then reserve it with that payment.
+
+    Each step is retried on its own, so a failed reserve is sent again with the
+    payment already made rather than paying twice.
+    """
+    attempt = AttemptRecord(
+        idempotency_key=key,
+        provider=provider.name,
+        user_id=provider.user.id,
+        date=provider.date,
+        job_id=current_job.get(),
+        candidate=provider.describe(venue, member),
+    )
+    with ledger_attempt(attempt, stopwatch, provider.member_ref(venue, member)):
+        with stopwatch.stage("pay"):
+            payment = job.call(provider.pay, venue, member, attempt)
+        try:
+            with stopwatch.stage("reserve"):
+                job.call(provider.reserve, venue, member, payment, attempt)
+        except BaseException:
+            provider.release(venue, member, payment)
+            raise
+
+
+def _book_one(
+    provider: Provider[Any, Any], job: BookingJob, candidate: Candidate
+) -> None:
+    with commit_gate():
+        _pay_and_reserve(
+            provider,
+            job,
+            candidate.venue,
+            candidate.members[0],
+            job.idempotency_key,
+            job.stopwatch,
+        )
+
+
+def _book_set(
+    provider: Provider[Any, Any], job: BookingJob, candidate: Candidate
+) -> int:
+    """Pay for and reserve every member at once, returning how many are held."""
+    indices = candidate.indices or list(range(len(candidate.members)))
+    with (
+        commit_gate() as gate,
+        ThreadPoolExecutor(max_workers=len(candidate.members)) as pool,
+    ):
+        futures = [
+            submit(
+                pool,
+                profiled(_pay_and_reserve),
+                provider,
+                job,
+                candidate.venue,
+                member,
+                member_key(job.idempotency_key, i),
+                job.stopwatch.fork(),
+            )
+            for i, member in zip(indices, candidate.members)
+        ]
+        booked, errors = 0, []
+        for future in futures:
+            try:
+                future.result()
+                booked += 1
+            except AlreadyBooked:
+                booked += 1
+            except Exception as e:
+                LOGGER.error("Error occurred while booking set member: %s", e)
+                errors.append(e)
+        if booked == 0:
+            # raise an error that stops the job ahead of one that moves on
+            stopping = [
+                e for e in errors if may_have_landed(e) or isinstance(e, PaidNotBooked)
+            ]
+            raise (stopping or errors)[0]
+        gate.partial = booked < len(candidate.members)
+    return booked
@@ -1,13 +1,23 @@
 import os
-from typing import Any, Generic, List, TypeVar
+from functools import cache
+from typing import TYPE_CHECKING, Any, Generic, List, TypeVar
 
-from cryptography.fernet import Fernet
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, PrivateAttr, field_validator, model_validator
 
 U = TypeVar("U", bound="BaseUserConfig")
 B = TypeVar("B", bound="BaseBookingSlot")
 R = TypeVar("R", bound="BaseReleaseSchedule")
 
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
+
+
+@cache
+def _fernet(key: str) -> "Fernet":
+    from cryptography.fernet import Fernet
+
+    return Fernet(key)
+
 
 class BaseUserConfig(BaseModel):
     id: str
@@ -21,8 +31,7 @@ class BaseUserConfig(BaseModel):
         "password", "card_number", "card_expiry", "card_cvc", mode="before"
     )
     def decrypt_fields(cls, v: str) -> str:
-        f = Fernet(os.environ["ENCRYPTION_KEY"])
-        return f.decrypt(v.encode()).decode()
+        return _fernet(os.environ["ENCRYPTION_KEY"]).decrypt(v.encode()).decode()
 
 
 class BaseReleaseSchedule(BaseModel):
@@ -30,35 +39,65 @@ class BaseReleaseSchedule(BaseModel):
     days: int
     hours: float
     minutes: int
+    # IANA (or Windows) zone the offsets are relative to; defaults to app.timezone
+    timezone: str | None = None
 
 
 class BaseBookingSlot(BaseModel):
     user: str
     id: str | None = None
 
+    def default_id(self) -> str:
+        """
+        ID for slots configured without one.
+
+        Made only from what identifies the slot, so editing its other settings
+        keeps its jobs and ledger entries.
+        """
+        return self.user
+
 
 class BaseConfig(BaseModel, Generic[U, B, R]):
     users: List[U]
     booking_slots: List[B]
     release_schedules: List[R]
 
+    _rs_by_id: dict[str, R] = PrivateAttr(default_factory=dict)
+    _users_by_id: dict[str, U] = PrivateAttr(default_factory=dict)
+    _bs_by_id: dict[str, B] = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode="after")
+    def index_by_id(self):
+        bs_by_id: dict[str, B] = {}
+        for bs in self.booking_slots:
+            if bs.id is None:
+                bs.id = bs.default_id()
+            if bs.id in bs_by_id:
+                raise ValueError(
+                    f"Duplicate booking slot ID: {bs.id} "
+                    "(slots that would share a default id need explicit ids)"
+                )
+            bs_by_id[bs.id] = bs
+
+        self._bs_by_id = bs_by_id
+        self._rs_by_id = {rs.id: rs for rs in self.release_schedules}
+        self._users_by_id = {u.id: u for u in self.users}
+        return self
+
     def get_rs_by_id(self, rs_id: str) -> R:
-        for rs in self.release_schedules:
-            if rs.id == rs_id:
-                return rs
+        if rs_id in self._rs_by_id:
+            return self._rs_by_id[rs_id]
         raise ValueError(f"Release schedule with ID {rs_id} not found")
 
     def get_user_by_id(self, user_id: str) -> U:
-        for u in self.users:
-            if u.id == user_id:
-                return u
+        if user_id in self._users_by_id:
+            return self._users_by_id[user_id]
 
         raise ValueError(f"User with ID {user_id} not found")
 
     def get_bs_by_id(self, bs_id: str) -> B:
-        for bs in self.booking_slots:
-            if bs.id == bs_id:
-                return bs
+        if bs_id in self._bs_by_id:
+            return self._bs_by_id[bs_id]
 
         raise ValueError(f"Booking slot with ID {bs_id} not found")
 
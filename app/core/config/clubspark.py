@@ -1,4 +1,6 @@
-from pydantic import model_validator
+from typing import Literal
+
+from pydantic import Field, model_validator
 
 from app.core.config.base import (
     BaseBookingConfig,
@@ -11,6 +13,8 @@ from app.core.config.base import (
 
 class ClubsparkUserConfig(BaseUserConfig):
     email: str | None = None
+    # pay from the user's prepaid venue credit where it covers the cost
+    pay_with_credit: bool = False
 
 
 class ClubsparkBookingSlot(BaseBookingSlot):
@@ -19,6 +23,21 @@ class ClubsparkBookingSlot(BaseBookingSlot):
     target_park: str
     target_courts: list[int]
     double_session: bool = False
+    # if no 2 hour block is free, book two back-to-back hours instead
+    split_double: bool = False
+    # book this many resources together: side by side at the same time
+    # ("courts") or back to back on the same court ("hours")
+    quantity: int = Field(default=1, ge=1)
+    adjacency: Literal["courts", "hours"] = "courts"
+    # other venues to try when target_park has nothing suitable
+    fallback_parks: list[str] = []
+    # also try any of the user's venues within this many km of target_park
+    fallback_radius_km: float | None = None
+    # ranking penalty per km from target_park; a step in target_times costs 100
+    distance_weight: float = 10
+
+    def default_id(self) -> str:
+        return f"{self.user}-{self.target_park}-{self.target_day}"
 
 
 class ClubsparkReleaseSchedule(BaseReleaseSchedule):
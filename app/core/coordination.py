@@ -0,0 +1,354 @@
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from app.core.config.app import CoordinationConfig
+
+LOGGER = logging.getLogger(__name__)
+
+current_job: ContextVar[Optional[str]] = ContextVar("current_job", default=None)
+
+
+class JobAlreadyCommitted(Exception):
+    """Raised when another node has already committed a booking for the job."""
+
+
+@dataclass
+class Gate:
+    """What a commit gate yields; a partial booking leaves the job uncommitted."""
+
+    partial: bool = False
+
+
+class LeaseBackend(ABC):
+    """Shared store through which nodes agree on who runs and who books a job."""
+
+    @abstractmethod
+    def acquire(self, job_id: str, owner: str, ttl: float) -> bool:
+        """Take (or take over) the lease on a job. False if held or finished."""
+
+    @abstractmethod
+    def renew(self, job_id: str, owner: str, ttl: float) -> bool:
+        """Extend a lease (and commit claim) held by owner."""
+
+    @abstractmethod
+    def finish(self, job_id: str, owner: str) -> None:
+        """Mark a job as finished so standby nodes stop waiting for it."""
+
+    @abstractmethod
+    def is_finished(self, job_id: str) -> bool:
+        """Whether the job has finished or been committed on any node."""
+
+    @abstractmethod
+    def claim_commit(self, job_id: str, owner: str, ttl: float) -> bool:
+        """Claim the exclusive right to pay for and reserve the job's booking."""
+
+    @abstractmethod
+    def release_claim(self, job_id: str, owner: str) -> None:
+        """Give up a commit claim after a failed attempt."""
+
+    @abstractmethod
+    def commit(self, job_id: str, owner: str) -> None:
+        """Record that owner successfully booked the job."""
+
+    @abstractmethod
+    def is_committed(self, job_id: str) -> bool:
+        """Whether any node has committed a booking for the job."""
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """
+    Lease backend on a SQLite file.
+
+    Suitable for nodes on one host or sharing a filesystem with working locks,
+    and for testing. Each operation opens its own connection so it is safe to use
+    from any scheduler thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS leases (
+                    job_id TEXT PRIMARY KEY,
+                    owner TEXT,
+                    expires_at REAL NOT NULL DEFAULT 0,
+                    claimed_by TEXT,
+                    claim_expires_at REAL NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL DEFAULT 'running'
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _row(self, conn: sqlite3.Connection, job_id: str) -> Optional[tuple[Any, ...]]:
+        conn.execute("INSERT OR IGNORE INTO leases (job_id) VALUES (?)", (job_id,))
+        return conn.execute(
+            "SELECT owner, expires_at, claimed_by, claim_expires_at, state "
+            "FROM leases WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+
+    def acquire(self, job_id: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            row = self._row(conn, job_id)
+            assert row is not None
+            current_owner, expires_at, _, _, state = row
+            if state != "running":
+                return False
+            if current_owner not in (None, owner) and expires_at > now:
+                return False
+            conn.execute(
+                "UPDATE leases SET owner = ?, expires_at = ? WHERE job_id = ?",
+                (owner, now + ttl, job_id),
+            )
+            return True
+
+    def renew(self, job_id: str, owner: str, ttl: float) -> bool:
+        expires_at = time.time() + ttl
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE leases SET claim_expires_at = ? "
+                "WHERE job_id = ? AND claimed_by = ?",
+                (expires_at, job_id, owner),
+            )
+            cursor = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE job_id = ? AND owner = ?",
+                (expires_at, job_id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: str, owner: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE leases SET state = 'done', owner = NULL "
+                "WHERE job_id = ? AND owner = ? AND state = 'running'",
+                (job_id, owner),
+            )
+
+    def is_finished(self, job_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT state FROM leases WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row is not None and row[0] != "running"
+
+    def claim_commit(self, job_id: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            row = self._row(conn, job_id)
+            assert row is not None
+            _, _, claimed_by, claim_expires_at, state = row
+            if state == "committed":
+                return False
+            if claimed_by not in (None, owner) and claim_expires_at > now:
+                return False
+            conn.execute(
+                "UPDATE leases SET claimed_by = ?, claim_expires_at = ? "
+                "WHERE job_id = ?",
+                (owner, now + ttl, job_id),
+            )
+            return True
+
+    def release_claim(self, job_id: str, owner: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE leases SET claimed_by = NULL "
+                "WHERE job_id = ? AND claimed_by = ?",
+                (job_id, owner),
+            )
+
+    def commit(self, job_id: str, owner: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE leases SET state = 'committed' "
+                "WHERE job_id = ? AND claimed_by = ?",
+                (job_id, owner),
+            )
+
+    def is_committed(self, job_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT state FROM leases WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row is not None and row[0] == "committed"
+
+
+lease_backends: dict[str, Callable[[CoordinationConfig], LeaseBackend]] = {
+    "sqlite": lambda config: SQLiteLeaseBackend(config.path),
+}
+
+
+class Coordinator:
+    """
+    Runs scheduled jobs under a lease so that only one node books each job.
+
+    Without hedging, the first node to fire a job takes its lease and renews it
+    while running; the others stand by and take over if the lease expires before
+    the job finishes. With hedging, every node runs the job and only the first to
+    claim the commit gate goes on to pay and reserve.
+    """
+
+    poll_interval = 0.5
+
+    def __init__(self, backend: LeaseBackend, config: CoordinationConfig):
+        self.backend = backend
+        self.node_id = config.node_id
+        self.lease_seconds = config.lease_seconds
+        self.takeover_seconds = config.takeover_seconds
+        self.hedge = config.hedge
+
+    def run(
+        self,
+        job_id: str,
+        action: Callable[..., None],
+        args: Optional[list[Any]] = None,
+        kwargs: Optional[dict[Any, Any]] = None,
+    ) -> None:
+        if self.backend.is_finished(job_id):
+            LOGGER.info("Job %s already finished on another node", job_id)
+            return
+
+        if not self.hedge and not self._wait_for_lease(job_id):
+            return
+
+        token = current_job.set(job_id)
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job_id, stop), daemon=True
+        )
+        heartbeat.start()
+        try:
+            action(*(args or []), **(kwargs or {}))
+        finally:
+            stop.set()
+            current_job.reset(token)
+            if not self.hedge:
+                self.backend.finish(job_id, self.node_id)
+
+    def _wait_for_lease(self, job_id: str) -> bool:
+        deadline = time.monotonic() + self.takeover_seconds
+        while not self.backend.acquire(job_id, self.node_id, self.lease_seconds):
+            if self.backend.is_finished(job_id):
+                LOGGER.info("Job %s finished on another node", job_id)
+                return False
+            if time.monotonic() > deadline:
+                LOGGER.info("Job %s still owned by another node, giving up", job_id)
+                return False
+            time.sleep(self.poll_interval)
+
+        LOGGER.info("Node %s owns job %s", self.node_id, job_id)
+        return True
+
+    def _heartbeat(self, job_id: str, stop: threading.Event) -> None:
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.backend.renew(job_id, self.node_id, self.lease_seconds)
+            except sqlite3.Error as e:
+                LOGGER.warning(f"Failed to renew lease on {job_id}: {e}")
+                continue
+            if not renewed and not self.hedge:
+                LOGGER.warning("Lost lease on job %s", job_id)
+
+    @contextmanager
+    def commit_gate(self, job_id: str) -> Iterator[Gate]:
+        deadline = time.monotonic() + self.takeover_seconds
+        while not self.backend.claim_commit(job_id, self.node_id, self.lease_seconds):
+            if self.backend.is_committed(job_id) or time.monotonic() > deadline:
+                raise JobAlreadyCommitted(f"Job {job_id} booked by another node")
+            time.sleep(self.poll_interval)
+
+        gate = Gate()
+        try:
+            yield gate
+        except BaseException:
+            self.backend.release_claim(job_id, self.node_id)
+            raise
+        if gate.partial:
+            # the rest of the set can still be booked, here or on another node
+            self.backend.release_claim(job_id, self.node_id)
+        else:
+            self.backend.commit(job_id, self.node_id)
+
+
+_coordinator: Optional[Coordinator] = None
+
+
+def run_job(
+    job_id: str,
+    action: Callable[..., None],
+    args: Optional[list[Any]] = None,
+    kwargs: Optional[dict[Any, Any]] = None,
+) -> None:
+    """
+    Scheduled wrapper for every job with an id.
+
+    Runs the job under a lease shared with the other nodes when coordination is
+    enabled, otherwise runs it directly. Either way the job id is exposed
+    through current_job.
+    """
+    if _coordinator is not None:
+        _coordinator.run(job_id, action, args, kwargs)
+        return
+
+    token = current_job.set(job_id)
+    try:
+        action(*(args or []), **(kwargs or {}))
+    finally:
+        current_job.reset(token)
+
+
+def configure_coordination(config: CoordinationConfig) -> Optional[Coordinator]:
+    global _coordinator
+    if not config.enabled:
+        _coordinator = None
+        return None
+
+    if config.backend not in lease_backends:
+        raise ValueError(f"Unknown coordination backend: {config.backend}")
+
+    _coordinator = Coordinator(lease_backends[config.backend](config), config)
+    return _coordinator
+
+
+@contextmanager
+def commit_gate() -> Iterator[Gate]:
+    """
+    Guard the pay-and-reserve step of a booking attempt.
+
+    Only one node can be inside the gate for a job at a time, and once an attempt
+    leaves it without raising the job is committed and every other node's gate
+    raises JobAlreadyCommitted. An attempt that sets partial on the yielded Gate
+    leaves the job uncommitted, so the rest of a set can be booked later. A
+    no-op when coordination is disabled.
+    """
+    job_id = current_job.get()
+    if _coordinator is None or job_id is None:
+        yield Gate()
+        return
+
+    with _coordinator.commit_gate(job_id) as gate:
+        yield gate
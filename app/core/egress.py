@@ -0,0 +1,195 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.core.config.app import EgressConfig, RouteConfig
+
+# smoothing for per-route latency and success rate
+ALPHA = 0.2
+DEFAULT_LATENCY = 0.2
+
+
+@dataclass
+class CircuitBreaker:
+    """
+    Cuts a route off from a host after repeated blocks.
+
+    Closed until failure_threshold consecutive failures, then open for the
+    cooldown. After the cooldown a single probe is let through: success closes
+    the circuit, failure reopens it for twice as long.
+    """
+
+    failure_threshold: int
+    cooldown: float
+    max_cooldown: float
+    failures: int = 0
+    open_until: float = 0.0
+    probing: bool = False
+    tripped: int = 0
+
+    def available(self, now: float) -> bool:
+        if self.failures < self.failure_threshold:
+            return True
+        return now >= self.open_until and not self.probing
+
+    def claim(self, now: float) -> None:
+        if self.failures >= self.failure_threshold and now >= self.open_until:
+            self.probing = True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.probing = False
+        self.tripped = 0
+
+    def failure(self, now: float) -> None:
+        self.failures += 1
+        if self.probing or self.failures == self.failure_threshold:
+            self.probing = False
+            self.tripped += 1
+            cooldown = min(self.cooldown * 2 ** (self.tripped - 1), self.max_cooldown)
+            self.open_until = now + cooldown
+            # keep the count at the threshold so the circuit stays open
+            self.failures = self.failure_threshold
+
+    @property
+    def open(self) -> bool:
+        return self.failures >= self.failure_threshold
+
+
+@dataclass
+class RouteHealth:
+    latency: float = DEFAULT_LATENCY
+    success_rate: float = 1.0
+    requests: int = 0
+    blocks: int = 0
+
+
+class EgressPool:
+    """
+    Routes out of the process (direct, proxies, source addresses) per host.
+
+    Each request picks a route at random, weighted by its configured weight,
+    measured success rate and latency, among the routes whose circuit to that
+    host is closed. The others follow in order of preference for failover.
+    """
+
+    def __init__(self, config: Optional[EgressConfig] = None):
+        self.configure(config or EgressConfig())
+
+    def configure(self, config: EgressConfig) -> None:
+        self.config = config
+        self.routes = {route.name: route for route in config.routes}
+        self.lock = threading.Lock()
+        self.breakers: dict[tuple[str, str], CircuitBreaker] = {}
+        self.health: dict[tuple[str, str], RouteHealth] = {}
+
+    def _breaker(self, host: str, route: str) -> CircuitBreaker:
+        breaker = self.breakers.get((host, route))
+        if breaker is None:
+            breaker = self.breakers[(host, route)] = CircuitBreaker(
+                self.config.failure_threshold,
+                self.config.cooldown_seconds,
+                self.config.max_cooldown_seconds,
+            )
+        return breaker
+
+    def _health(self, host: str, route: str) -> RouteHealth:
+        health = self.health.get((host, route))
+        if health is None:
+            health = self.health[(host, route)] = RouteHealth()
+        return health
+
+    def _score(self, host: str, route: RouteConfig) -> float:
+        health = self._health(host, route.name)
+        return (
+            route.weight * max(health.success_rate, 0.01) / max(health.latency, 0.001)
+        )
+
+    def routes_for(self, host: str) -> list[RouteConfig]:
+        """Routes to try for a request to host, first choice first."""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [
+                route
+                for route in self.routes.values()
+                if self._breaker(host, route.name).available(now)
+            ]
+            if not candidates:
+                return []
+
+            scores = [self._score(host, route) for route in candidates]
+            first = random.choices(candidates, weights=scores)[0]
+            rest = sorted(
+                (r for r in candidates if r is not first),
+                key=lambda r: self._score(host, r),
+                reverse=True,
+            )
+            return [first, *rest]
+
+    def begin(self, host: str, route: str) -> bool:
+        """Claim route for a request to host, unless its circuit has opened since."""
+        now = time.monotonic()
+        with self.lock:
+            breaker = self._breaker(host, route)
+            if not breaker.available(now):
+                return False
+            breaker.claim(now)
+            return True
+
+    def abandon(self, host: str, route: str) -> None:
+        """Release a claim whose request failed for reasons unrelated to the route."""
+        with self.lock:
+            self._breaker(host, route).probing = False
+
+    def retry_after(self, host: str) -> float:
+        """Seconds until the first route to host is let through again."""
+        now = time.monotonic()
+        with self.lock:
+            return max(
+                0.0,
+                min(
+                    (
+                        self._breaker(host, name).open_until - now
+                        for name in self.routes
+                    ),
+                    default=0.0,
+                ),
+            )
+
+    def record(
+        self, host: str, route: str, ok: bool, latency: Optional[float] = None
+    ) -> None:
+        with self.lock:
+            breaker = self._breaker(host, route)
+            health = self._health(host, route)
+            health.requests += 1
+            health.success_rate += ALPHA * ((1.0 if ok else 0.0) - health.success_rate)
+            if latency is not None:
+                health.latency += ALPHA * (latency - health.latency)
+            if ok:
+                breaker.success()
+            else:
+                health.blocks += 1
+                breaker.failure(time.monotonic())
+
+    def state(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """Circuit and health of each route, per host."""
+        now = time.monotonic()
+        with self.lock:
+            state: dict[str, dict[str, dict[str, Any]]] = {}
+            for (host, route), health in self.health.items():
+                breaker = self._breaker(host, route)
+                state.setdefault(host, {})[route] = {
+                    "open": breaker.open and now < breaker.open_until,
+                    "reopens_in": max(0.0, breaker.open_until - now),
+                    "latency": round(health.latency, 4),
+                    "success_rate": round(health.success_rate, 3),
+                    "requests": health.requests,
+                    "blocks": health.blocks,
+                }
+            return state
+
+
+egress = EgressPool()
@@ -0,0 +1,110 @@
+import requests
+
+
+class RequestError(Exception):
+    """A request to a booking API failed. Keeps the status code and body."""
+
+    def __init__(
+        self, message: str, status_code: int | None = None, body: str | None = None
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class AuthExpiredError(RequestError):
+    """The access token was rejected or could not be obtained."""
+
+
+class ConflictError(RequestError):
+    """The slot was taken, or the booking was otherwise refused."""
+
+
+class RateLimitedError(RequestError):
+    """The API asked us to slow down."""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int | None = None,
+        body: str | None = None,
+        retry_after: float | None = None,
+    ):
+        super().__init__(message, status_code, body)
+        self.retry_after = retry_after
+
+
+class ServerError(RequestError):
+    """The API failed on its side (5xx)."""
+
+
+class NetworkTimeoutError(RequestError):
+    """
+    The request timed out or the connection failed.
+
+    A request that isn't idempotent may still have gone through.
+    """
+
+    def __init__(self, message: str, idempotent: bool = True):
+        super().__init__(message)
+        self.idempotent = idempotent
+
+
+class ClientError(RequestError):
+    """Any other 4xx response."""
+
+
+class BlockedError(RequestError):
+    """Refused by bot protection: a 403 or a Cloudflare challenge page."""
+
+
+class CircuitOpenError(RequestError):
+    """Every route to the host is cooling down after repeated blocks."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_challenge(response: requests.Response) -> bool:
+    """Whether the response is a Cloudflare challenge rather than the API."""
+    if response.headers.get("cf-mitigated") == "challenge":
+        return True
+    if response.status_code not in (403, 503):
+        return False
+    if "cloudflare" not in response.headers.get("Server", "").lower():
+        return False
+    return "challenge-platform" in response.text or "Just a moment" in response.text
+
+
+def is_block(response: requests.Response) -> bool:
+    """Whether the response means this route is blocked or throttled."""
+    return response.status_code in (403, 429) or is_challenge(response)
+
+
+def raise_for_response(response: requests.Response) -> None:
+    """Raise the typed error matching a non-2xx response."""
+    status = response.status_code
+    if status < 299:
+        return
+
+    message = f"Request failed with status code {status}: {response.text[:500]}"
+    if status == 403 or is_challenge(response):
+        raise BlockedError(message, status, response.text)
+    if status == 401:
+        raise AuthExpiredError(message, status, response.text)
+    if status == 409:
+        raise ConflictError(message, status, response.text)
+    if status == 429:
+        retry_after = response.headers.get("Retry-After")
+        raise RateLimitedError(
+            message,
+            status,
+            response.text,
+            retry_after=float(retry_after)
+            if retry_after and retry_after.isdigit()
+            else None,
+        )
+    if status >= 500:
+        raise ServerError(message, status, response.text)
+    raise ClientError(message, status, response.text)
@@ -0,0 +1,183 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from app.bookers.clubspark.token_manager import stored_token_status
+from app.bookers.clubspark.venues import get_venue_cache
+from app.core import http
+from app.core.config.app import HealthConfig
+from app.core.egress import egress
+from app.core.hedging import hedger
+from app.core.metrics import format_sample, metrics
+from app.core.rate_limit import rate_limiter
+from app.core.scheduler import Scheduler
+from app.core.settings import get_settings
+from app.core.shutdown import safe_restart
+
+LOGGER = logging.getLogger(__name__)
+
+PREFIX = "omnibooker"
+
+
+class HealthServer:
+    """
+    Localhost HTTP endpoint for monitoring.
+
+    /metrics serves the Prometheus text format, /status a JSON document,
+    /restart when the next safe restart window is, and /healthz a plain "ok".
+    """
+
+    def __init__(self, scheduler: Scheduler, config: HealthConfig):
+        self.scheduler = scheduler
+        self.config = config
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def status(self) -> dict[str, Any]:
+        jobs = self.scheduler.jobs()
+        venue_cache = get_venue_cache()
+        return {
+            "time": time.time(),
+            "jobs": {
+                "count": len(jobs),
+                "next": [
+                    {
+                        "id": job_id,
+                        "name": name,
+                        "run_at": run_at.isoformat(),
+                        "timestamp": run_at.timestamp(),
+                    }
+                    for job_id, name, run_at in jobs[: self.config.next_jobs]
+                    if run_at is not None
+                ],
+            },
+            "executor": self.scheduler.executor_state(),
+            "restart": safe_restart(self.scheduler, get_settings().app.shutdown),
+            "tokens": {
+                user.id: stored_token_status(user.id)
+                for user in get_settings().clubspark.users
+            },
+            "http_pools": http.pool_state(),
+            "egress": egress.state(),
+            "hedging": hedger.state(),
+            "rate_limits": rate_limiter.metrics(),
+            "job_starts": metrics.recent("job_starts"),
+            "skipped_jobs": venue_cache.skipped if venue_cache is not None else {},
+            "bookings": {
+                "recent": metrics.recent("bookings"),
+                "duration_ms": {
+                    dict(key).get("provider", ""): summary
+                    for key, summary in metrics.summary("booking_duration_ms").items()
+                },
+            },
+        }
+
+    def prometheus(self) -> str:
+        status = self.status()
+        lines: list[str] = []
+
+        def gauge(name: str, value: float, **labels: Any) -> None:
+            lines.append(format_sample(f"{PREFIX}_{name}", value, **labels))
+
+        gauge("scheduled_jobs", status["jobs"]["count"])
+        gauge("skipped_jobs", len(status["skipped_jobs"]))
+        gauge("restart_safe", int(status["restart"]["safe_now"]))
+        for job in status["jobs"]["next"]:
+            gauge("job_next_fire_timestamp_seconds", job["timestamp"], job=job["id"])
+        for key, value in status["executor"].items():
+            gauge(f"executor_{key}", value)
+        for user_id, token in status["tokens"].items():
+            gauge("token_valid", int(token["access_token_valid"]), user=user_id)
+            gauge("token_refreshable", int(token["has_refresh_token"]), user=user_id)
+            if token["expires_at"]:
+                gauge(
+                    "token_expiry_timestamp_seconds", token["expires_at"], user=user_id
+                )
+        for host, routes in status["http_pools"].items():
+            for route, pool in routes.items():
+                labels = {"host": host, "route": route}
+                gauge("http_pool_connections", pool["connections"], **labels)
+                gauge("http_pool_idle", pool["idle"], **labels)
+                gauge("http_pool_requests_total", pool["requests"], **labels)
+        for host, routes in status["egress"].items():
+            for route, health in routes.items():
+                labels = {"host": host, "route": route}
+                gauge("circuit_open", int(health["open"]), **labels)
+                gauge("route_latency_seconds", health["latency"], **labels)
+                gauge("route_success_rate", health["success_rate"], **labels)
+                gauge("route_blocks_total", health["blocks"], **labels)
+        for endpoint, delay_ms in status["hedging"]["delay_ms"].items():
+            gauge("hedge_delay_seconds", delay_ms / 1000, endpoint=endpoint)
+        for key, counts in status["rate_limits"].items():
+            host, _, budget = key.rpartition("/")
+            for name, value in counts.items():
+                gauge(f"rate_limit_{name}_total", value, host=host, budget=budget)
+
+        lines.extend(metrics.prometheus(PREFIX))
+        return "\n".join(lines) + "\n"
+
+    def start(self) -> None:
+        health = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                try:
+                    if self.path == "/metrics":
+                        body = health.prometheus()
+                        content_type = "text/plain; version=0.0.4"
+                    elif self.path == "/status":
+                        body = json.dumps(health.status(), indent=2, default=str)
+                        content_type = "application/json"
+                    elif self.path == "/restart":
+                        body = json.dumps(
+                            safe_restart(health.scheduler, get_settings().app.shutdown),
+                            indent=2,
+                        )
+                        content_type = "application/json"
+                    elif self.path == "/healthz":
+                        body, content_type = "ok\n", "text/plain"
+                    else:
+                        self.send_error(404)
+                        return
+                except Exception:
+                    LOGGER.exception("Failed to render %s", self.path)
+                    self.send_error(500)
+                    return
+
+                payload = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                LOGGER.debug(format, *args)
+
+        try:
+            self.server = ThreadingHTTPServer(
+                (self.config.host, self.config.port), Handler
+            )
+        except OSError as e:
+            LOGGER.error(
+                "Health endpoint disabled, cannot bind %s:%d: %s",
+                self.config.host,
+                self.config.port,
+                e,
+            )
+            return
+        self.server.daemon_threads = True
+        threading.Thread(
+            target=self.server.serve_forever, name="health", daemon=True
+        ).start()
+        LOGGER.info(
+            "Health endpoint on http://%s:%d", self.config.host, self.server.server_port
+        )
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
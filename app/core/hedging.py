@@ -0,0 +1,159 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config.app import HedgingConfig
+from app.core.metrics import metrics
+from app.core.rate_limit import RELEASE, current_budget
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# set by the hedged call running on this thread once its request is sent
+_sent: ContextVar[Optional[threading.Event]] = ContextVar("hedge_sent", default=None)
+
+
+def mark_sent() -> None:
+    """Note that the hedged request on this thread is past the rate limiter."""
+    sent = _sent.get()
+    if sent is not None:
+        sent.set()
+
+
+class Hedger:
+    """
+    Hedged requests: send a duplicate when the first is slower than usual.
+
+    The hedge delay for each endpoint is a high quantile of its recent
+    latencies, clamped to [min_delay_ms, max_delay_ms]. Hedges are capped at
+    max_ratio of hedged calls and max_in_flight at a time, so a slow backend
+    doesn't have its load doubled. Only for requests that are safe to repeat.
+
+    Requests are timed from when they're sent, so time spent waiting on the
+    rate limiter neither triggers a hedge nor counts as latency.
+    """
+
+    def __init__(self, config: Optional[HedgingConfig] = None):
+        self.configure(config or HedgingConfig())
+
+    def configure(self, config: HedgingConfig) -> None:
+        self.config = config
+        self.lock = threading.Lock()
+        self.latencies: dict[str, deque[float]] = {}
+        self.calls = 0
+        self.hedges = 0
+        self.in_flight = 0
+        # threads are only started as needed, so size for the busiest release
+        self.pool = ThreadPoolExecutor(
+            max_workers=config.max_workers + config.max_in_flight,
+            thread_name_prefix="hedge",
+        )
+
+    def applies(self) -> bool:
+        return self.config.enabled and (
+            not self.config.release_only or current_budget.get() == RELEASE
+        )
+
+    def delay(self, endpoint: str) -> float:
+        """Seconds to wait on a request to endpoint before hedging it."""
+        config = self.config
+        with self.lock:
+            samples = sorted(self.latencies.get(endpoint, ()))
+        if len(samples) < config.min_samples:
+            delay_ms = config.default_delay_ms
+        else:
+            index = min(len(samples) - 1, int(config.quantile * len(samples)))
+            delay_ms = samples[index] * 1000
+        return min(max(delay_ms, config.min_delay_ms), config.max_delay_ms) / 1000
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        with self.lock:
+            samples = self.latencies.get(endpoint)
+            if samples is None:
+                samples = self.latencies[endpoint] = deque(maxlen=self.config.window)
+            samples.append(seconds)
+
+    def _claim(self) -> bool:
+        with self.lock:
+            allowed = (
+                self.in_flight < self.config.max_in_flight
+                and self.hedges < self.config.max_ratio * self.calls
+            )
+            if allowed:
+                self.hedges += 1
+                self.in_flight += 1
+            return allowed
+
+    def _release(self, _: "Future[Any]") -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+    def _submit(self, fn: Callable[[], T], sent: threading.Event) -> "Future[T]":
+        context = contextvars.copy_context()
+        context.run(_sent.set, sent)
+        future = self.pool.submit(context.run, fn)
+        # fn may fail before sending anything
+        future.add_done_callback(lambda _: sent.set())
+        return future
+
+    def call(self, endpoint: str, fn: Callable[[], T]) -> T:
+        """
+        fn(), hedged with a second fn() if the first is slow.
+
+        Returns whichever finishes first without raising; raises the first
+        call's error only if both fail.
+        """
+        if not self.applies():
+            return fn()
+
+        with self.lock:
+            self.calls += 1
+        sent = threading.Event()
+        primary = self._submit(fn, sent)
+        sent.wait()
+        started = time.perf_counter()
+        done, _ = wait([primary], timeout=self.delay(endpoint))
+        if done or not self._claim():
+            result = primary.result()
+            self.observe(endpoint, time.perf_counter() - started)
+            return result
+
+        LOGGER.info(
+            "%s slower than %.0f ms, hedging", endpoint, self.delay(endpoint) * 1000
+        )
+        metrics.inc("hedges_sent_total", endpoint=endpoint)
+        hedge = self._submit(fn, threading.Event())
+        hedge.add_done_callback(self._release)
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.observe(endpoint, time.perf_counter() - started)
+                    if future is hedge:
+                        metrics.inc("hedges_won_total", endpoint=endpoint)
+                    return future.result()
+        return primary.result()
+
+    def state(self) -> dict[str, Any]:
+        with self.lock:
+            endpoints = list(self.latencies)
+            state: dict[str, Any] = {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "in_flight": self.in_flight,
+            }
+        state["delay_ms"] = {
+            endpoint: round(self.delay(endpoint) * 1000, 1) for endpoint in endpoints
+        }
+        return state
+
+
+hedger = Hedger()
@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config.app import RouteConfig
+from app.core.egress import egress
+from app.core.errors import CircuitOpenError, NetworkTimeoutError, is_block
+from app.core.hedging import mark_sent
+from app.core.rate_limit import rate_limiter
+
+LOGGER = logging.getLogger(__name__)
+
+# keep-alive connections per host, enough for a burst of release jobs
+POOL_SIZE = 20
+
+# safe to send again on another route after a timeout
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_sessions: dict[tuple[str, str], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class SourceAddressAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections are made from a given local address."""
+
+    def __init__(self, source_address: str, **kwargs: Any):
+        self.source_address = (source_address, 0)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs["source_address"] = self.source_address
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args: Any, **kwargs: Any) -> Any:
+        kwargs["source_address"] = self.source_address
+        return super().proxy_manager_for(*args, **kwargs)
+
+
+def _session(host: str, route: RouteConfig) -> requests.Session:
+    """A pooled session per host and route, shared by every thread and account."""
+    session = _sessions.get((host, route.name))
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get((host, route.name))
+        if session is None:
+            session = requests.Session()
+            adapter = (
+                SourceAddressAdapter(
+                    route.source_address, pool_connections=1, pool_maxsize=POOL_SIZE
+                )
+                if route.source_address
+                else HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if route.proxy:
+                session.proxies = {"http": route.proxy, "https": route.proxy}
+            # sessions are shared across users, so never carry cookies between them
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _sessions[(host, route.name)] = session
+    return session
+
+
+def send(
+    method: str,
+    url: str,
+    account: Optional[str] = None,
+    idempotent: Optional[bool] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Send a request through the process-wide rate limiter and egress pool.
+
+    Blocked or throttled responses (403, 429, Cloudflare challenges) and
+    timeouts count against the route used, and the request fails over to the
+    next route; timeouts only for idempotent requests. Whether a request is
+    idempotent follows its method unless idempotent says otherwise. When every
+    route to the host is cooling down, CircuitOpenError is raised without
+    sending anything. Timeouts and connection failures are raised as
+    NetworkTimeoutError.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    host = urlsplit(url).hostname or ""
+    routes = egress.routes_for(host)
+    if not routes:
+        raise CircuitOpenError(
+            f"All routes to {host} are cooling down", egress.retry_after(host)
+        )
+
+    waited = rate_limiter.acquire(host, account)
+    if waited > 0:
+        LOGGER.debug("Throttled %s %s for %.3fs", method, host, waited)
+    mark_sent()
+
+    response: Optional[requests.Response] = None
+    for i, route in enumerate(routes):
+        if not egress.begin(host, route.name):
+            continue
+        last = i == len(routes) - 1
+        started = time.perf_counter()
+        try:
+            response = _session(host, route).request(method, url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            egress.record(host, route.name, ok=False)
+            if not last and idempotent:
+                LOGGER.warning(
+                    "%s %s via %s failed, failing over: %s", method, host, route.name, e
+                )
+                continue
+            raise NetworkTimeoutError(
+                f"{method} {url} failed: {e}", idempotent=idempotent
+            ) from e
+        except Exception:
+            egress.abandon(host, route.name)
+            raise
+
+        if is_block(response):
+            egress.record(host, route.name, ok=False)
+            if not last:
+                LOGGER.warning(
+                    "%s %s via %s blocked (%d), failing over",
+                    method,
+                    host,
+                    route.name,
+                    response.status_code,
+                )
+                continue
+        else:
+            egress.record(
+                host, route.name, ok=True, latency=time.perf_counter() - started
+            )
+        return response
+
+    if response is not None:
+        return response
+    raise CircuitOpenError(
+        f"All routes to {host} are cooling down", egress.retry_after(host)
+    )
+
+
+def pool_state() -> dict[str, dict[str, dict[str, int]]]:
+    """Connections opened, idle and requests sent per host and route."""
+    with _sessions_lock:
+        sessions = dict(_sessions)
+
+    state: dict[str, dict[str, dict[str, int]]] = {}
+    for (host, route), session in sessions.items():
+        adapter = session.get_adapter(f"https://{host}")
+        managers = [adapter.poolmanager, *adapter.proxy_manager.values()]  # type: ignore[attr-defined]
+        totals = {"connections": 0, "idle": 0, "requests": 0, "maxsize": POOL_SIZE}
+        for manager in managers:
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                totals["connections"] += pool.num_connections
+                totals["requests"] += pool.num_requests
+                totals["idle"] += sum(1 for conn in list(pool.pool.queue) if conn)
+        state.setdefault(host, {})[route] = totals
+    return state
@@ -0,0 +1,330 @@
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator, Optional
+
+from app.core.config.app import LedgerConfig
+from app.core.metrics import metrics
+from app.core.retry import may_have_landed
+
+LOGGER = logging.getLogger(__name__)
+
+BOOKED = "booked"
+PENDING = "pending"
+PAID = "paid"
+UNKNOWN = "unknown"
+
+
+class AlreadyBooked(Exception):
+    """The ledger shows the slot-date as booked, or with a payment in flight."""
+
+
+class PaidNotBooked(Exception):
+    """A payment went through but the session it was for couldn't be reserved."""
+
+
+class Stopwatch:
+    """Collects per-stage timings (in ms) for a booking job."""
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 3)
+            metrics.observe("booking_stage_ms", self.timings[name], stage=name)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 3)
+
+    def fork(self) -> "Stopwatch":
+        """A copy for one of several attempts running in parallel."""
+        forked = Stopwatch()
+        forked.started_at = self.started_at
+        forked._start = self._start
+        forked.timings = dict(self.timings)
+        return forked
+
+
+@dataclass
+class AttemptRecord:
+    idempotency_key: str
+    provider: str
+    user_id: str
+    date: str
+    job_id: Optional[str] = None
+    candidate: Optional[str] = None
+    payment_id: Optional[str] = None
+    session_result: Optional[int] = None
+    outcome: str = "failed"
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    elapsed_ms: Optional[float] = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+class Ledger:
+    """
+    Append-only SQLite record of booking attempts.
+
+    Every attempt is appended to `attempts`. `bookings` holds one row per
+    idempotency key (provider, slot and date): a `pending` row while a payment
+    is in flight, a `paid` row if the payment went through but the session
+    wasn't reserved, an `unknown` row if a request that may have gone through
+    timed out, and a `booked` row once it is, so a rerun never pays for a date
+    twice - even after a crash mid-payment. Delete a `paid` or `unknown` row
+    to let the date be tried again. A `booked` row can keep a detail of what it holds,
+    as JSON, for completing a partly booked set.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS attempts (
+                    id INTEGER PRIMARY KEY,
+                    idempotency_key TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    job_id TEXT,
+                    candidate TEXT,
+                    payment_id TEXT,
+                    session_result INTEGER,
+                    outcome TEXT NOT NULL,
+                    error TEXT,
+                    started_at REAL NOT NULL,
+                    elapsed_ms REAL,
+                    timings TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS attempts_by_key
+                    ON attempts (idempotency_key, started_at);
+                CREATE INDEX IF NOT EXISTS attempts_by_time
+                    ON attempts (started_at, outcome);
+                CREATE TABLE IF NOT EXISTS bookings (
+                    idempotency_key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    payment_id TEXT,
+                    updated_at REAL NOT NULL,
+                    detail TEXT
+                );
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(bookings)")}
+            if "detail" not in columns:
+                conn.execute("ALTER TABLE bookings ADD COLUMN detail TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def record(self, attempt: AttemptRecord) -> None:
+        row = asdict(attempt)
+        row["timings"] = json.dumps(row["timings"])
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{c}" for c in row)
+        with self.lock, closing(self._connect()) as conn:
+            conn.execute(
+                f"INSERT INTO attempts ({columns}) VALUES ({placeholders})", row
+            )
+
+    def booking_state(self, idempotency_key: str) -> Optional[str]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT state FROM bookings WHERE idempotency_key = ?",
+                (idempotency_key,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def booking_detail(self, idempotency_key: str) -> Optional[dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT detail FROM bookings WHERE idempotency_key = ?",
+                (idempotency_key,),
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def begin(self, idempotency_key: str) -> bool:
+        """Mark a payment as in flight. False if the key is already pending/booked."""
+        with self.lock, closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO bookings (idempotency_key, state, updated_at) "
+                "VALUES (?, ?, ?)",
+                (idempotency_key, PENDING, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def complete(
+        self,
+        idempotency_key: str,
+        payment_id: Optional[str],
+        detail: Optional[dict[str, Any]] = None,
+    ) -> None:
+        with self.lock, closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE bookings SET state = ?, payment_id = ?, updated_at = ?, "
+                "detail = ? WHERE idempotency_key = ?",
+                (
+                    BOOKED,
+                    payment_id,
+                    time.time(),
+                    json.dumps(detail) if detail is not None else None,
+                    idempotency_key,
+                ),
+            )
+
+    def hold(
+        self, idempotency_key: str, payment_id: Optional[str], state: str = PAID
+    ) -> None:
+        """Keep the key from being paid for again after a failed attempt."""
+        with self.lock, closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE bookings SET state = ?, payment_id = ?, updated_at = ? "
+                "WHERE idempotency_key = ?",
+                (state, payment_id, time.time(), idempotency_key),
+            )
+
+    def abandon(self, idempotency_key: str) -> None:
+        with self.lock, closing(self._connect()) as conn:
+            conn.execute(
+                "DELETE FROM bookings WHERE idempotency_key = ? AND state = ?",
+                (idempotency_key, PENDING),
+            )
+
+    def summary(self, since: float = 0) -> list[dict[str, Any]]:
+        """Per slot-date: whether it was booked and how fast, newest first."""
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                """
+                SELECT idempotency_key,
+                       MIN(started_at) AS first_attempt_at,
+                       COUNT(*) AS attempts,
+                       MAX(outcome = 'booked') AS booked,
+                       MIN(CASE WHEN outcome = 'booked' THEN elapsed_ms END)
+                           AS time_to_book_ms
+                FROM attempts
+                WHERE started_at >= ?
+                GROUP BY idempotency_key
+                ORDER BY first_attempt_at DESC
+                """,
+                (since,),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+
+_ledger: Optional[Ledger] = None
+
+
+def configure_ledger(config: LedgerConfig) -> Optional[Ledger]:
+    global _ledger
+    _ledger = Ledger(config.path) if config.enabled else None
+    return _ledger
+
+
+def get_ledger() -> Optional[Ledger]:
+    return _ledger
+
+
+def already_booked(idempotency_key: str) -> Optional[str]:
+    """The ledger state (booked, paid, unknown or pending) that should stop a rerun."""
+    if _ledger is None:
+        return None
+    return _ledger.booking_state(idempotency_key)
+
+
+def booked_detail(idempotency_key: str) -> Optional[dict[str, Any]]:
+    """What a booked key holds, as recorded when it was booked."""
+    if _ledger is None:
+        return None
+    return _ledger.booking_detail(idempotency_key)
+
+
+def record_attempt(attempt: AttemptRecord) -> None:
+    if _ledger is None:
+        return
+    try:
+        _ledger.record(attempt)
+    except sqlite3.Error as e:
+        LOGGER.error(f"Failed to record attempt in ledger: {e}")
+
+
+@contextmanager
+def ledger_attempt(
+    attempt: AttemptRecord,
+    stopwatch: Stopwatch,
+    detail: Optional[dict[str, Any]] = None,
+) -> Iterator[AttemptRecord]:
+    """
+    Record a pay-and-reserve attempt, holding the idempotency key while it runs.
+
+    The attempt is marked booked, keeping detail, if the block exits normally
+    and failed if it raises. A failure that may have gone through anyway keeps
+    the key held as unknown. Any other failure after attempt.payment_id was set
+    keeps it held as paid and is raised as PaidNotBooked. Stages timed on the stopwatch inside
+    the block belong to this attempt only. Raises AlreadyBooked if the key is
+    already held.
+    """
+    if _ledger is not None and not _ledger.begin(attempt.idempotency_key):
+        raise AlreadyBooked(
+            f"{attempt.idempotency_key} is already "
+            f"{_ledger.booking_state(attempt.idempotency_key)} in the ledger"
+        )
+
+    attempt.started_at = stopwatch.started_at
+    job_timings = dict(stopwatch.timings)
+    try:
+        yield attempt
+    except BaseException as e:
+        attempt.outcome = "failed"
+        attempt.error = repr(e)
+        payment_id = attempt.payment_id
+        landed = isinstance(e, Exception) and may_have_landed(e)
+        if _ledger is not None:
+            if landed:
+                _ledger.hold(attempt.idempotency_key, payment_id, UNKNOWN)
+            elif payment_id is None:
+                _ledger.abandon(attempt.idempotency_key)
+            else:
+                _ledger.hold(attempt.idempotency_key, payment_id)
+        if payment_id is not None and not landed and isinstance(e, Exception):
+            raise PaidNotBooked(
+                f"{attempt.idempotency_key} was paid ({payment_id}) but not booked: {e}"
+            ) from e
+        raise
+    else:
+        attempt.outcome = BOOKED
+        if _ledger is not None:
+            _ledger.complete(attempt.idempotency_key, attempt.payment_id, detail)
+    finally:
+        attempt.elapsed_ms = stopwatch.elapsed_ms()
+        attempt.timings = dict(stopwatch.timings)
+        stopwatch.timings = job_timings
+        record_attempt(attempt)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarise the booking ledger")
+    parser.add_argument("--path", default=LedgerConfig().path)
+    parser.add_argument("--days", type=float, default=30)
+    args = parser.parse_args()
+
+    ledger = Ledger(args.path)
+    since = time.time() - args.days * 86400
+    print(json.dumps(ledger.summary(since), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from typing import Any, Optional
+
+from app.core.config.app import LoggingConfig
+from app.core.coordination import current_job
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(job_id)s] %(message)s"
+
+
+class JobQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records with their message rendered but not formatted.
+
+    The message is rendered in the calling thread, so arguments that change
+    afterwards (a balance being spent) are logged as they were. The job id is
+    captured too; timestamps, JSON and tracebacks are left to the listener
+    thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.job_id = current_job.get() or "-"
+        return record
+
+
+class JobFilter(logging.Filter):
+    """Sets job_id on records that did not come through JobQueueHandler."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "job_id"):
+            record.job_id = current_job.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        document: dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "job_id": getattr(record, "job_id", "-"),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            document["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@atexit.register
+def stop_logging() -> None:
+    """
+    Flush and stop the listener thread, if running.
+
+    Runs at exit; call it before os._exit, which skips atexit handlers.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(config: LoggingConfig) -> None:
+    """Replace the root handlers with a (queued) stream handler."""
+    global _listener
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        JsonFormatter() if config.format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    handler.addFilter(JobFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.setLevel(config.level)
+
+    stop_logging()
+
+    if not config.queue:
+        root.addHandler(handler)
+        return
+
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    root.addHandler(JobQueueHandler(records))
+    _listener = logging.handlers.QueueListener(
+        records, handler, respect_handler_level=True
+    )
+    _listener.start()
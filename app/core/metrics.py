@@ -0,0 +1,129 @@
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any
+
+Labels = tuple[tuple[str, str], ...]
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def format_sample(name: str, value: float, **labels: Any) -> str:
+    """One line of the Prometheus text format."""
+    return f"{name}{_format_labels(_labels(labels))} {value}"
+
+
+class Metrics:
+    """
+    In-process counters, recent samples and recent events.
+
+    Counters are monotonic totals; samples keep the last max_samples values of
+    each series for quantiles; events keep the last max_events dicts of each
+    kind for the JSON status document.
+    """
+
+    def __init__(self, max_samples: int = 500, max_events: int = 50):
+        self.lock = threading.Lock()
+        self.max_samples = max_samples
+        self.max_events = max_events
+        self.counters: dict[str, dict[Labels, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self.samples: dict[str, dict[Labels, deque[float]]] = defaultdict(dict)
+        self.events: dict[str, deque[dict[str, Any]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        with self.lock:
+            self.counters[name][_labels(labels)] += value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self.lock:
+            series = self.samples[name].get(key)
+            if series is None:
+                series = self.samples[name][key] = deque(maxlen=self.max_samples)
+            series.append(value)
+
+    def event(self, kind: str, **fields: Any) -> None:
+        with self.lock:
+            events = self.events.get(kind)
+            if events is None:
+                events = self.events[kind] = deque(maxlen=self.max_events)
+            events.append({"at": time.time(), **fields})
+
+    def recent(self, kind: str) -> list[dict[str, Any]]:
+        with self.lock:
+            return list(self.events.get(kind, ()))
+
+    def summary(self, name: str) -> dict[Labels, dict[str, float]]:
+        with self.lock:
+            series = {key: list(values) for key, values in self.samples[name].items()}
+        return {key: _summarise(values) for key, values in series.items() if values}
+
+    def prometheus(self, prefix: str = "omnibooker") -> list[str]:
+        """Counters and sample quantiles in the Prometheus text format."""
+        with self.lock:
+            counters = {
+                name: dict(series) for name, series in self.counters.items() if series
+            }
+            samples = {
+                name: {key: list(values) for key, values in series.items()}
+                for name, series in self.samples.items()
+            }
+
+        lines: list[str] = []
+        for name, series in sorted(counters.items()):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for key, value in series.items():
+                lines.append(f"{prefix}_{name}{_format_labels(key)} {value}")
+        for name, series in sorted(samples.items()):
+            lines.append(f"# TYPE {prefix}_{name} summary")
+            for key, values in series.items():
+                if not values:
+                    continue
+                for q, value in zip(QUANTILES, _quantiles(values)):
+                    lines.append(
+                        f"{prefix}_{name}{_format_labels(key, quantile=str(q))} {value}"
+                    )
+                lines.append(
+                    f"{prefix}_{name}_count{_format_labels(key)} {len(values)}"
+                )
+                lines.append(f"{prefix}_{name}_sum{_format_labels(key)} {sum(values)}")
+        return lines
+
+
+def _quantiles(values: list[float]) -> list[float]:
+    ordered = sorted(values)
+    return [ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES]
+
+
+def _summarise(values: list[float]) -> dict[str, float]:
+    p50, p90, p99 = _quantiles(values)
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values),
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+        "max": max(values),
+    }
+
+
+# process-wide; the health endpoint reads from here
+metrics = Metrics()
@@ -0,0 +1,158 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from contextvars import ContextVar
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config.app import ProfilingConfig
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# "1" profiles every job; anything else is a comma-separated list of job globs
+ENV_SWITCH = "OMNIBOOKER_PROFILE"
+
+_config: Optional[ProfilingConfig] = None
+# cProfile can only have one profiler active per interpreter
+_active = threading.Lock()
+
+
+class PoolTimings:
+    """Calls, wall and CPU seconds of each task a profiled job ran on a pool."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.tasks: dict[str, list[float]] = {}
+
+    def record(self, name: str, wall: float, cpu: float) -> None:
+        with self.lock:
+            task = self.tasks.setdefault(name, [0, 0.0, 0.0])
+            task[0] += 1
+            task[1] += wall
+            task[2] += cpu
+
+    def report(self) -> str:
+        with self.lock:
+            tasks = sorted(self.tasks.items(), key=lambda task: -task[1][2])
+        lines = [f"{'calls':>6} {'wall ms':>9} {'cpu ms':>9}  task"]
+        for name, (calls, wall, cpu) in tasks:
+            lines.append(
+                f"{calls:>6.0f} {wall * 1000:>9.1f} {cpu * 1000:>9.1f}  {name}"
+            )
+        return "\n".join(lines)
+
+
+# timings for the pool tasks of the job being profiled in this context
+_pool_timings: ContextVar[Optional[PoolTimings]] = ContextVar(
+    "pool_timings", default=None
+)
+
+
+def configure_profiling(config: ProfilingConfig) -> Optional[ProfilingConfig]:
+    global _config
+    switch = os.environ.get(ENV_SWITCH, "").strip()
+    if switch:
+        jobs = [] if switch == "1" else [j.strip() for j in switch.split(",") if j]
+        config = config.model_copy(update={"enabled": True, "jobs": jobs})
+
+    _config = config if config.enabled else None
+    return _config
+
+
+def should_profile(provider: Optional[str], venue: Optional[str], *names: str) -> bool:
+    """Whether a job with this provider, venue and id/name should be profiled."""
+    if _config is None:
+        return False
+    if not (_config.providers or _config.venues or _config.jobs):
+        return True
+    return (
+        provider in _config.providers
+        or venue in _config.venues
+        or any(fnmatch(name, job) for name in names for job in _config.jobs)
+    )
+
+
+def profiled(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    fn, timed into the profiled job's pool timings when it runs.
+
+    Wrap callables handed to a pool while the job runs: cProfile follows only
+    the job's own thread cleanly.
+    """
+    timings = _pool_timings.get()
+    if timings is None:
+        return fn
+    name = getattr(fn, "__qualname__", repr(fn))
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings.record(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    return run
+
+
+def run_profiled(
+    name: str,
+    action: Callable[..., None],
+    args: list[Any],
+    kwargs: dict[Any, Any],
+) -> None:
+    """
+    Run action under cProfile, writing its stats and logging the hotspots.
+
+    Work the job hands to pools is timed per task alongside. cProfile can't
+    tell one thread's calls from another's, so its figures for that work are
+    mixed in with the job thread's and only approximate.
+    """
+    if _config is None or not _active.acquire(blocking=False):
+        LOGGER.info("Another job is being profiled, running %s unprofiled", name)
+        action(*args, **kwargs)
+        return
+
+    profiler = cProfile.Profile()
+    timings = PoolTimings()
+    token = _pool_timings.set(timings)
+    try:
+        profiler.runcall(action, *args, **kwargs)
+    finally:
+        _pool_timings.reset(token)
+        _active.release()
+        try:
+            _report(_config, name, profiler, timings)
+        except Exception as e:
+            LOGGER.warning(f"Failed to write profile for {name}: {e}")
+
+
+def _report(
+    config: ProfilingConfig,
+    name: str,
+    profiler: cProfile.Profile,
+    timings: PoolTimings,
+) -> None:
+    directory = Path(config.directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    safe_name = re.sub(r"[^\w.-]+", "_", name)
+    path = directory / f"{safe_name}-{time.strftime('%Y%m%dT%H%M%S')}.pstats"
+    profiler.dump_stats(path)
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(config.top)
+    if timings.tasks:
+        stream.write(
+            "Pool tasks (cProfile figures above for these are approximate, "
+            "as it mixes calls from every thread):\n"
+        )
+        stream.write(timings.report() + "\n")
+    LOGGER.info("Profile of %s written to %s\n%s", name, path, stream.getvalue())
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from app.core.config.app import BucketConfig, RateLimitConfig
+
+RELEASE = "release"
+SCAN = "scan"
+BACKGROUND = "background"
+
+current_budget: ContextVar[str] = ContextVar("current_budget", default=BACKGROUND)
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Callers reserve a token and sleep off any debt."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Process-wide request limiter keyed by host and by account.
+
+    Each key has one bucket per budget, so the burst of requests made by booking
+    jobs at release time does not compete with background traffic.
+    """
+
+    def __init__(self, config: Optional[RateLimitConfig] = None):
+        self.configure(config or RateLimitConfig())
+
+    def configure(self, config: RateLimitConfig) -> None:
+        self.config = config
+        self.buckets: dict[tuple[str, str, str], TokenBucket] = {}
+        self.lock = threading.Lock()
+        self.requests: dict[tuple[str, str], int] = defaultdict(int)
+        self.throttled: dict[tuple[str, str], int] = defaultdict(int)
+        self.wait_seconds: dict[tuple[str, str], float] = defaultdict(float)
+
+    def _bucket(
+        self, scope: str, key: str, budget: str, limits: dict[str, BucketConfig]
+    ) -> Optional[TokenBucket]:
+        bucket_config = limits.get(budget)
+        if bucket_config is None:
+            return None
+
+        with self.lock:
+            bucket = self.buckets.get((scope, key, budget))
+            if bucket is None:
+                bucket = TokenBucket(bucket_config.rate, bucket_config.burst)
+                self.buckets[(scope, key, budget)] = bucket
+            return bucket
+
+    def acquire(self, host: str, account: Optional[str] = None) -> float:
+        """Block until a request to host (on behalf of account) is allowed."""
+        budget = current_budget.get()
+        if not self.config.enabled:
+            return 0.0
+
+        buckets = [self._bucket("host", host, budget, self.config.host)]
+        if account is not None:
+            buckets.append(
+                self._bucket("account", account, budget, self.config.account)
+            )
+
+        wait = max((b.reserve() for b in buckets if b is not None), default=0.0)
+        with self.lock:
+            self.requests[(host, budget)] += 1
+            if wait > 0:
+                self.throttled[(host, budget)] += 1
+                self.wait_seconds[(host, budget)] += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def expected_seconds(self, budget: str, requests: int) -> float:
+        """How long requests on one host and account take to get through budget."""
+        if not self.config.enabled:
+            return 0.0
+        limits = [
+            bucket
+            for bucket in (
+                self.config.host.get(budget),
+                self.config.account.get(budget),
+            )
+            if bucket is not None
+        ]
+        return max(
+            (max(0, requests - bucket.burst) / bucket.rate for bucket in limits),
+            default=0.0,
+        )
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        with self.lock:
+            return {
+                f"{host}/{budget}": {
+                    "requests": self.requests[(host, budget)],
+                    "throttled": self.throttled[(host, budget)],
+                    "wait_seconds": self.wait_seconds[(host, budget)],
+                }
+                for host, budget in list(self.requests)
+            }
+
+
+rate_limiter = RateLimiter()
+
+
+@contextmanager
+def request_budget(budget: str) -> Iterator[None]:
+    """Charge requests made in this context to the given budget."""
+    token = current_budget.set(budget)
+    try:
+        yield
+    finally:
+        current_budget.reset(token)
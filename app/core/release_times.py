@@ -0,0 +1,158 @@
+import argparse
+import datetime
+import logging
+import sys
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+LOGGER = logging.getLogger(__name__)
+
+# Windows zone names, as some venue APIs report them, for the zones we book in
+WINDOWS_TIMEZONES = {
+    "GMT Standard Time": "Europe/London",
+    "Greenwich Standard Time": "Atlantic/Reykjavik",
+    "W. Europe Standard Time": "Europe/Berlin",
+    "Romance Standard Time": "Europe/Paris",
+    "Central Europe Standard Time": "Europe/Budapest",
+    "Irish Standard Time": "Europe/Dublin",
+    "UTC": "UTC",
+}
+
+# standard UTC offset (hours) of zones on the EU summer time rule, used as an
+# independent reference by sweep; None for no summer time
+REFERENCE_ZONES: dict[str, int | None] = {
+    "Europe/London": 0,
+    "Europe/Dublin": 0,
+    "Europe/Lisbon": 0,
+    "Europe/Paris": 1,
+    "Europe/Berlin": 1,
+    "Europe/Budapest": 1,
+    "UTC": None,
+}
+
+# release offsets checked by sweep: midnight, early hours and late evening,
+# the same day or up to two weeks before
+SWEEP_OFFSETS = [
+    datetime.timedelta(days=d, hours=h, minutes=m)
+    for d in (0, 1, 6, 7, 14)
+    for h in (0, 1, 2, 22)
+    for m in (0, 30)
+]
+
+
+def resolve_timezone(name: str | None, default: str) -> ZoneInfo:
+    """ZoneInfo for an IANA or Windows zone name, falling back to default."""
+    if name:
+        try:
+            return ZoneInfo(WINDOWS_TIMEZONES.get(name, name))
+        except (ZoneInfoNotFoundError, ValueError):
+            LOGGER.warning("Unknown time zone %r, using %s", name, default)
+    return ZoneInfo(default)
+
+
+def make_calendar(tz: ZoneInfo, days: int) -> list[datetime.date]:
+    """Each date from today (in tz) to days ahead."""
+    today = datetime.datetime.now(tz).date()
+    return [today + datetime.timedelta(days=i) for i in range(days)]
+
+
+def midnight(date: datetime.date, tz: ZoneInfo) -> datetime.datetime:
+    return datetime.datetime.combine(date, datetime.time(0, 0), tzinfo=tz)
+
+
+def release_time(
+    date: datetime.date, offset: datetime.timedelta, tz: ZoneInfo
+) -> datetime.datetime:
+    """
+    The instant bookings for date open: offset before its midnight, in wall time.
+
+    Arithmetic on a zoneinfo-aware datetime is wall-clock arithmetic, and the
+    UTC offset is looked up for the resulting local time, so "7 days before
+    midnight" stays at midnight local time across a BST/GMT change.
+    """
+    return midnight(date, tz) - offset
+
+
+def _last_sunday(year: int, month: int) -> datetime.date:
+    last = datetime.date(year, month + 1, 1) - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() + 1) % 7)
+
+
+def reference_utc(
+    wall: datetime.datetime, standard_hours: int | None
+) -> datetime.datetime | None:
+    """
+    The UTC instant of the naive local time wall under the EU summer time rule.
+
+    Worked out from the rule itself (clocks go forward an hour at 01:00 UTC on
+    the last Sunday of March, back on the last Sunday of October) rather than
+    from zoneinfo. None for times skipped when the clocks go forward; repeated
+    times resolve to the first, as zoneinfo's fold=0 does.
+    """
+    if standard_hours is None:
+        return wall
+    standard = datetime.timedelta(hours=standard_hours)
+    hour = datetime.timedelta(hours=1)
+    change = datetime.time(1, 0)
+    starts = datetime.datetime.combine(_last_sunday(wall.year, 3), change) + standard
+    ends = datetime.datetime.combine(_last_sunday(wall.year, 10), change) + standard
+    if starts <= wall < starts + hour:
+        return None
+    if starts + hour <= wall < ends + hour:
+        return wall - standard - hour
+    return wall - standard
+
+
+def sweep(
+    tz: ZoneInfo, start: datetime.date, days: int, offsets: list[datetime.timedelta]
+) -> list[str]:
+    """
+    Check release_time against reference_utc for every date and offset.
+
+    Only zones in REFERENCE_ZONES can be checked; the rule they follow has
+    been in force since 1996.
+    """
+    if tz.key not in REFERENCE_ZONES:
+        raise ValueError(f"No reference rule for {tz.key}")
+    standard_hours = REFERENCE_ZONES[tz.key]
+    utc = datetime.timezone.utc
+    problems: list[str] = []
+    for i in range(days):
+        date = start + datetime.timedelta(days=i)
+        for offset in offsets:
+            wall = datetime.datetime.combine(date, datetime.time(0, 0)) - offset
+            expected = reference_utc(wall, standard_hours)
+            if expected is None:
+                continue
+            run_at = release_time(date, offset, tz).astimezone(utc)
+            if run_at.replace(tzinfo=None) != expected:
+                problems.append(
+                    f"{date} -{offset}: fires at {run_at}, wanted {expected} UTC"
+                )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Sweep release-time computation across DST changes"
+    )
+    parser.add_argument(
+        "--timezone", default="Europe/London", choices=sorted(REFERENCE_ZONES)
+    )
+    parser.add_argument("--start", default="2020-01-01")
+    parser.add_argument("--years", type=int, default=20)
+    args = parser.parse_args()
+
+    problems = sweep(
+        ZoneInfo(args.timezone),
+        datetime.date.fromisoformat(args.start),
+        args.years * 366,
+        SWEEP_OFFSETS,
+    )
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} problems")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import logging
+import time
+from enum import Enum
+from typing import Callable, Optional, TypeVar
+
+from app.core.config.app import RetryConfig
+from app.core.errors import (
+    AuthExpiredError,
+    CircuitOpenError,
+    NetworkTimeoutError,
+    RateLimitedError,
+    ServerError,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Action(Enum):
+    RETRY = "retry"
+    NEXT = "next"
+    REFRESH_AUTH = "refresh_auth"
+    STOP = "stop"
+
+
+class DeadlineExceeded(Exception):
+    """The release window for the job has passed."""
+
+
+def may_have_landed(error: Exception) -> bool:
+    """Whether a failed request may have taken effect anyway, e.g. a timed out POST."""
+    return isinstance(error, NetworkTimeoutError) and not error.idempotent
+
+
+class RetryPolicy:
+    """
+    Decides what to do after a failed request, driven by a per-job deadline.
+
+    Transient errors are retried with backoff, an expired token is refreshed once,
+    and anything else moves on to the next candidate. Requests that may have gone
+    through are never sent again, and nothing is retried once the deadline has
+    passed.
+    """
+
+    def __init__(self, config: RetryConfig, deadline: Optional[float] = None):
+        self.config = config
+        self.deadline = (
+            deadline
+            if deadline is not None
+            else time.monotonic() + config.window_seconds
+        )
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def decide(self, error: Exception, attempt: int, refreshed: bool) -> Action:
+        if self.expired():
+            return Action.STOP
+        if may_have_landed(error):
+            # sending it again could pay or book twice
+            return Action.STOP
+        if isinstance(error, AuthExpiredError):
+            return Action.STOP if refreshed else Action.REFRESH_AUTH
+        if isinstance(
+            error,
+            (NetworkTimeoutError, ServerError, RateLimitedError, CircuitOpenError),
+        ):
+            if attempt < self.config.max_attempts:
+                return Action.RETRY
+        return Action.NEXT
+
+    def backoff(self, error: Exception, attempt: int) -> None:
+        delay = min(
+            self.config.backoff_seconds * 2 ** (attempt - 1),
+            self.config.max_backoff_seconds,
+        )
+        if (
+            isinstance(error, (RateLimitedError, CircuitOpenError))
+            and error.retry_after is not None
+        ):
+            delay = max(delay, error.retry_after)
+        time.sleep(max(0.0, min(delay, self.remaining())))
+
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args: object,
+        refresh_auth: Optional[Callable[[], object]] = None,
+        **kwargs: object,
+    ) -> T:
+        """
+        Call fn until it succeeds or the policy gives up.
+
+        Errors that should move on to the next candidate are re-raised as is;
+        DeadlineExceeded is raised once the release window has passed.
+        """
+        attempt = 0
+        refreshed = False
+        while True:
+            if self.expired():
+                raise DeadlineExceeded("Release window has passed")
+            attempt += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                action = self.decide(e, attempt, refreshed)
+                LOGGER.info(f"Attempt {attempt} failed ({e!r}), action: {action.value}")
+                if action is Action.REFRESH_AUTH and refresh_auth is not None:
+                    refresh_auth()
+                    refreshed = True
+                elif action is Action.RETRY:
+                    self.backoff(e, attempt)
+                elif action is Action.STOP and self.expired():
+                    raise DeadlineExceeded("Release window has passed") from e
+                else:
+                    raise
@@ -1,13 +1,73 @@
-from datetime import datetime
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from math import ceil, inf
 from typing import Any, Callable, Optional
 
-from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore
-from apscheduler.triggers.date import DateTrigger  # type: ignore
+from app.core.config.app import PrecisionConfig
+from app.core.coordination import run_job
+from app.core.metrics import metrics
+from app.core.profiling import run_profiled
+
+LOGGER = logging.getLogger(__name__)
+
+# executor for jobs waiting on a precise start
+PRECISE = "precise"
+
+
+def wait_until(target: float, spin_seconds: float) -> float:
+    """
+    Block until the wall-clock instant target, returning how late we woke (s).
+
+    Sleeps until spin_seconds before the target, then spins on the monotonic
+    clock, yielding the GIL each pass so concurrent waiters don't starve.
+    """
+    deadline = time.perf_counter() + (target - time.time())
+    remaining = deadline - time.perf_counter()
+    if remaining > spin_seconds:
+        time.sleep(remaining - spin_seconds)
+    while time.perf_counter() < deadline:
+        time.sleep(0)
+    return time.time() - target
+
+
+def run_precisely(
+    target: float,
+    name: str,
+    spin_seconds: float,
+    action: Callable[..., None],
+    args: list[Any],
+    kwargs: dict[Any, Any],
+) -> None:
+    """Start action at target rather than whenever the scheduler thread woke."""
+    woke_early = target - time.time()
+    jitter_ms = wait_until(target, spin_seconds) * 1000
+    metrics.observe("job_start_jitter_ms", jitter_ms)
+    metrics.event("job_starts", job=name, jitter_ms=round(jitter_ms, 3))
+    if woke_early < 0:
+        LOGGER.warning("%s was handed over %.1f ms late", name, -woke_early * 1000)
+    LOGGER.info("%s started %.3f ms after its target", name, jitter_ms)
+    action(*args, **kwargs)
 
 
 class Scheduler:
-    def __init__(self) -> None:
-        self.scheduler = BackgroundScheduler()
+    def __init__(self, precision: PrecisionConfig = PrecisionConfig()) -> None:
+        self.precision = precision
+        from apscheduler.executors.pool import ThreadPoolExecutor  # type: ignore
+        from apscheduler.schedulers.background import (  # type: ignore
+            BackgroundScheduler,
+        )
+
+        self.scheduler = BackgroundScheduler(
+            executors={
+                "default": ThreadPoolExecutor(),
+                PRECISE: ThreadPoolExecutor(max_workers=precision.max_workers),
+            }
+        )
+        # release instant of each precise job, kept after it fires
+        self.releases: dict[str, float] = {}
+        self.releases_lock = threading.Lock()
         self.scheduler.start()  # type: ignore
 
     def schedule_task(
@@ -17,16 +77,155 @@ class Scheduler:
         action: Callable[..., None],
         args: Optional[list[Any]] = None,
         kwargs: Optional[dict[Any, Any]] = None,
+        job_id: Optional[str] = None,
+        precise: bool = False,
+        profile: bool = False,
     ) -> None:
+        """
+        Run action at run_at.
+
+        Precise jobs fire lead_seconds early and wait for run_at themselves,
+        after taking their lease, so they start within about a millisecond.
+        Each holds a thread while it waits, so those beyond max_workers queue for
+        one; their misfire grace covers the lead and misfire_grace_seconds past
+        run_at, so they start late rather than not at all. Profiled jobs run
+        under cProfile once started.
+        """
+        from apscheduler.triggers.date import DateTrigger  # type: ignore
+
+        func: Callable[..., None] = action
+        executor = "default"
+        misfire: dict[str, int] = {}
+        args = args if args else []
+        kwargs = kwargs if kwargs else {}
+        if precise:
+            with self.releases_lock:
+                self.releases[job_id or name] = run_at.timestamp()
+        if profile:
+            func, args, kwargs = run_profiled, [job_id or name, func, args, kwargs], {}
+        if precise and self.precision.enabled:
+            target = run_at.timestamp()
+            spin = self.precision.spin_seconds
+            args, kwargs = [target, job_id or name, spin, func, args, kwargs], {}
+            func = run_precisely
+            run_at = run_at - timedelta(seconds=self.precision.lead_seconds)
+            executor = PRECISE
+            misfire["misfire_grace_time"] = ceil(
+                self.precision.lead_seconds + self.precision.misfire_grace_seconds
+            )
+        if job_id is not None:
+            args, kwargs = [job_id, func, args, kwargs], {}
+            func = run_job
+
         self.scheduler.add_job(  # type: ignore
-            func=action,
+            func=func,
             trigger=DateTrigger(run_date=run_at),
-            args=args if args else [],
-            kwargs=kwargs if kwargs else {},
+            args=args,
+            kwargs=kwargs,
+            id=job_id or name,
+            name=name,
+            executor=executor,
+            replace_existing=True,
+            **misfire,
+        )
+
+    def schedule_recurring(
+        self,
+        name: str,
+        every: timedelta,
+        action: Callable[..., None],
+        args: Optional[list[Any]] = None,
+        first_run: Optional[datetime] = None,
+    ) -> None:
+        from apscheduler.triggers.interval import IntervalTrigger  # type: ignore
+
+        self.scheduler.add_job(  # type: ignore
+            func=action,
+            trigger=IntervalTrigger(seconds=every.total_seconds()),
+            args=args or [],
             id=name,
             name=name,
+            next_run_time=first_run,
             replace_existing=True,
+            coalesce=True,
+            max_instances=1,
         )
 
-    def shutdown(self) -> None:
-        self.scheduler.shutdown()  # type: ignore
+    def run_now(
+        self, name: str, action: Callable[..., None], args: Optional[list[Any]] = None
+    ) -> None:
+        """
+        Run action on the default executor straight away.
+
+        It's tracked like any scheduled job, so shutdown waits for it, and it
+        runs however long it queues for a thread.
+        """
+        self.scheduler.add_job(  # type: ignore
+            func=action,
+            args=args or [],
+            id=name,
+            name=name,
+            replace_existing=True,
+            misfire_grace_time=None,
+        )
+
+    def run_at(self, job_id: str) -> Optional[datetime]:
+        """When a pending job is due, as given to schedule_task; None if not pending."""
+        job = self.scheduler.get_job(job_id)  # type: ignore
+        if job is None or job.next_run_time is None:
+            return None
+        if job.executor == PRECISE:
+            return job.next_run_time + timedelta(seconds=self.precision.lead_seconds)
+        return job.next_run_time
+
+    def has_job(self, job_id: str) -> bool:
+        return self.scheduler.get_job(job_id) is not None  # type: ignore
+
+    def remove_job(self, job_id: str) -> bool:
+        """Unschedule a pending job, returning whether there was one."""
+        from apscheduler.jobstores.base import JobLookupError  # type: ignore
+
+        with self.releases_lock:
+            self.releases.pop(job_id, None)
+        try:
+            self.scheduler.remove_job(job_id)  # type: ignore
+        except JobLookupError:
+            return False
+        return True
+
+    def release_times(self, since: float) -> list[float]:
+        """Release instants of precise jobs from since on, soonest first."""
+        with self.releases_lock:
+            # forget releases long gone, so the map doesn't grow forever
+            self.releases = {
+                job_id: target
+                for job_id, target in self.releases.items()
+                if target >= since
+            }
+            return sorted(self.releases.values())
+
+    def jobs(self) -> list[tuple[str, str, Optional[datetime]]]:
+        """(id, name, next fire time) of each pending job, soonest first."""
+        jobs = [
+            (job.id, job.name, job.next_run_time)
+            for job in self.scheduler.get_jobs()  # type: ignore
+        ]
+        return sorted(jobs, key=lambda job: job[2].timestamp() if job[2] else inf)
+
+    def executor_state(self) -> dict[str, int]:
+        """Jobs waiting for an executor thread, and jobs currently running."""
+        state = {"queued": 0, "running": 0, "max_workers": 0}
+        for executor in self.scheduler._executors.values():  # type: ignore
+            pool = getattr(executor, "_pool", None)
+            work_queue = getattr(pool, "_work_queue", None)
+            instances: dict[str, int] = getattr(executor, "_instances", {})
+            queued = work_queue.qsize() if work_queue is not None else 0
+            # instances count a job from submission, so they include the queued ones
+            state["queued"] += queued
+            state["running"] += max(0, sum(instances.values()) - queued)
+            state["max_workers"] += getattr(pool, "_max_workers", 0)
+        return state
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop firing jobs; with wait, block until running ones finish."""
+        self.scheduler.shutdown(wait=wait)  # type: ignore
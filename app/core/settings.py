@@ -1,11 +1,34 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
 from dataclasses import dataclass
-from typing import Union, cast
+from pathlib import Path
+from typing import Optional, Union, cast
 
+import pydantic
 import yaml
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
+from app.core.config.app import (
+    CoordinationConfig,
+    EgressConfig,
+    HealthConfig,
+    HedgingConfig,
+    HistoryConfig,
+    LedgerConfig,
+    LoggingConfig,
+    PrecisionConfig,
+    ProfilingConfig,
+    RateLimitConfig,
+    RetryConfig,
+    ShutdownConfig,
+    VenueCheckConfig,
+    WatcherConfig,
+)
 from app.core.config.better import (
     BetterBookingSlot,
     BetterConfig,
@@ -25,14 +48,18 @@ from app.core.config.gymbox import (
     GymboxUserConfig,
 )
 
+LOGGER = logging.getLogger(__name__)
+
+# where the validated config is cached between starts; "off" to disable
+SNAPSHOT_ENV = "OMNIBOOKER_CONFIG_SNAPSHOT"
+DEFAULT_SNAPSHOT = "omnibooker_config.snapshot"
+
 UserConfigType = Union[BetterUserConfig, GymboxUserConfig, ClubsparkUserConfig]
 BookingSlotType = Union[BetterBookingSlot, GymboxBookingSlot, ClubsparkBookingSlot]
 ReleaseScheduleType = Union[
     BetterReleaseSchedule, GymboxReleaseSchedule, ClubsparkReleaseSchedule
 ]
 
-_ = load_dotenv()
-
 
 class AppConfig(BaseSettings):
     timezone: str
@@ -45,6 +72,20 @@ class AppConfig(BaseSettings):
     smtp_host: str
     smtp_port: int
     email_from: str
+    coordination: CoordinationConfig = CoordinationConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    retry: RetryConfig = RetryConfig()
+    ledger: LedgerConfig = LedgerConfig()
+    history: HistoryConfig = HistoryConfig()
+    logging: LoggingConfig = LoggingConfig()
+    health: HealthConfig = HealthConfig()
+    precision: PrecisionConfig = PrecisionConfig()
+    watcher: WatcherConfig = WatcherConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
+    venue_check: VenueCheckConfig = VenueCheckConfig()
+    egress: EgressConfig = EgressConfig()
+    hedging: HedgingConfig = HedgingConfig()
+    shutdown: ShutdownConfig = ShutdownConfig()
 
 
 class Config(BaseModel):
@@ -82,8 +123,12 @@ model_loader_map = {
 
 def load_config(config_path: str = "config.yml") -> "Config":
     _ = load_dotenv()
-    with open(config_path, "r") as file:
-        config_data = yaml.safe_load(file)
+    with open(config_path, "rb") as file:
+        return parse_config(file.read())
+
+
+def parse_config(raw: bytes) -> "Config":
+    config_data = yaml.safe_load(raw)
 
     app_config = AppConfig.model_validate(config_data["app"])
 
@@ -142,4 +187,124 @@ def load_config(config_path: str = "config.yml") -> "Config":
     )
 
 
-settings = load_config()
+def _code_version() -> str:
+    """Hash of the modules that define the config models."""
+    digest = hashlib.sha256(pydantic.VERSION.encode())
+    here = Path(__file__).parent
+    for path in [Path(__file__), *sorted((here / "config").glob("*.py"))]:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _snapshot_digest(raw: bytes) -> str:
+    """Key of a snapshot: the config file, the env it reads, and the code."""
+    digest = hashlib.sha256(raw)
+    for name in sorted(AppConfig.model_fields):
+        digest.update(f"{name}={os.environ.get(name.upper())}".encode())
+    digest.update(_code_version().encode())
+    return digest.hexdigest()
+
+
+def _read_snapshot(path: str, digest: str, key: str) -> Optional["Config"]:
+    """
+    The config in the snapshot at path, if it was written for digest.
+
+    The digest is checked before anything is unpickled, so a snapshot of other
+    code never is; one that still fails to unpickle is a miss.
+    """
+    from cryptography.fernet import Fernet, InvalidToken
+
+    try:
+        with open(path, "rb") as file:
+            token = file.read()
+    except OSError:
+        return None
+    try:
+        # authenticated by the key, so only a snapshot we wrote is read
+        snapshot_digest, _, payload = Fernet(key).decrypt(token).partition(b"\n")
+    except (InvalidToken, ValueError):
+        LOGGER.warning("Ignoring unreadable config snapshot %s", path)
+        return None
+    if snapshot_digest != digest.encode():
+        return None
+    try:
+        config: Config = pickle.loads(payload)
+    except Exception as e:
+        LOGGER.warning(f"Ignoring config snapshot {path} that failed to load: {e}")
+        return None
+    return config
+
+
+def _write_snapshot(path: str, digest: str, key: str, config: "Config") -> None:
+    from cryptography.fernet import Fernet
+
+    token = Fernet(key).encrypt(digest.encode() + b"\n" + pickle.dumps(config))
+    tmp = f"{path}.tmp"
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(token)
+        os.replace(tmp, path)
+    except OSError as e:
+        LOGGER.warning(f"Failed to write config snapshot {path}: {e}")
+
+
+def load_config_snapshot(config_path: str = "config.yml") -> "Config":
+    """
+    load_config, from an encrypted snapshot of the validated config if current.
+
+    The snapshot is keyed by the config file, the environment the app config
+    reads, and the config code, so any change to those validates afresh.
+    """
+    _ = load_dotenv()
+    path = os.environ.get(SNAPSHOT_ENV, DEFAULT_SNAPSHOT).strip()
+    key = os.environ.get("ENCRYPTION_KEY")
+    if path.lower() in ("", "0", "off") or not key:
+        return load_config(config_path)
+
+    with open(config_path, "rb") as file:
+        raw = file.read()
+    digest = _snapshot_digest(raw)
+    config = _read_snapshot(path, digest, key)
+    if config is not None:
+        LOGGER.debug("Loaded config from snapshot %s", path)
+        return config
+
+    config = parse_config(raw)
+    _write_snapshot(path, digest, key, config)
+    return config
+
+
+_settings: Optional["Config"] = None
+_settings_mtime: Optional[float] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings(config_path: str = "config.yml") -> "Config":
+    """
+    The process-wide config, loaded from config.yml on first use.
+
+    Reloaded when the file changes, so jobs that look their user and slot up at
+    fire time see edits without being rescheduled. A file that fails to load
+    keeps the previous config in place.
+    """
+    global _settings, _settings_mtime
+    try:
+        mtime: Optional[float] = os.stat(config_path).st_mtime
+    except OSError:
+        mtime = None
+
+    if _settings is not None and mtime == _settings_mtime:
+        return _settings
+
+    with _settings_lock:
+        if _settings is None or mtime != _settings_mtime:
+            try:
+                _settings = load_config_snapshot(config_path)
+            except Exception:
+                if _settings is None:
+                    raise
+                LOGGER.exception("Failed to reload config, keeping the previous one")
+            _settings_mtime = mtime
+
+    return _settings
@@ -0,0 +1,257 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from types import FrameType
+from typing import Any, Optional
+
+from app.core.config.app import ShutdownConfig
+from app.core.hedging import hedger
+from app.core.metrics import metrics
+from app.core.scheduler import Scheduler
+
+LOGGER = logging.getLogger(__name__)
+
+# start and end of a span of time, as unix timestamps
+Window = tuple[float, float]
+
+
+def blackouts(releases: list[float], config: ShutdownConfig) -> list[Window]:
+    """The windows around releases in which not to stop, overlapping ones merged."""
+    windows: list[Window] = []
+    for release in sorted(releases):
+        start = release - config.blackout_before_seconds
+        end = release + config.blackout_after_seconds
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def blackout_at(now: float, windows: list[Window]) -> Optional[Window]:
+    for start, end in windows:
+        if start <= now < end:
+            return start, end
+    return None
+
+
+def next_safe_restart(
+    releases: list[float], config: ShutdownConfig, now: float
+) -> dict[str, Any]:
+    """
+    When a restart can next go ahead, and until when.
+
+    until is the start of the following blackout, or None if no release is
+    scheduled after it.
+    """
+    windows = blackouts(releases, config)
+    current = blackout_at(now, windows)
+    safe_from = current[1] if current is not None else now
+    until = next((start for start, _ in windows if start > safe_from), None)
+    return {
+        "safe_now": current is None,
+        "from": _isoformat(safe_from),
+        "until": _isoformat(until) if until is not None else None,
+        "seconds_until_safe": round(safe_from - now, 1),
+    }
+
+
+def safe_restart(
+    scheduler: Scheduler, config: ShutdownConfig, now: Optional[float] = None
+) -> dict[str, Any]:
+    """next_safe_restart for the releases scheduler has armed."""
+    now = time.time() if now is None else now
+    releases = scheduler.release_times(now - config.blackout_after_seconds)
+    return next_safe_restart(releases, config, now)
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.UTC).isoformat()
+
+
+class GracefulShutdown:
+    """
+    Stops the app on SIGTERM or SIGINT without cutting a release short.
+
+    A signal inside a release's blackout is held until the window has passed,
+    for at most max_delay_seconds. Then the scheduler stops firing jobs, and
+    running ones get drain_timeout_seconds to finish. Pending jobs and warm
+    state are written to state_path for the next start. A second signal
+    skips the wait.
+    """
+
+    def __init__(self, scheduler: Scheduler, config: ShutdownConfig):
+        self.scheduler = scheduler
+        self.config = config
+        self.requested = threading.Event()
+        self.forced = threading.Event()
+
+    def install(self) -> None:
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle)
+
+    def _handle(self, signum: int, frame: Optional[FrameType]) -> None:
+        name = signal.Signals(signum).name
+        if self.requested.is_set():
+            LOGGER.warning("%s received again, stopping without waiting", name)
+            self.forced.set()
+        else:
+            LOGGER.info("%s received, shutting down", name)
+            self.requested.set()
+
+    def wait(self) -> None:
+        """Block until a shutdown is requested."""
+        # a timed wait, so the main thread gets to run signal handlers
+        while not self.requested.wait(1):
+            pass
+
+    def hold(self) -> None:
+        """Wait until outside every release's blackout, within max_delay_seconds."""
+        deadline = time.time() + self.config.max_delay_seconds
+        while not self.forced.is_set():
+            now = time.time()
+            since = now - self.config.blackout_after_seconds
+            windows = blackouts(self.scheduler.release_times(since), self.config)
+            window = blackout_at(now, windows)
+            if window is None:
+                return
+            if now >= deadline:
+                LOGGER.warning(
+                    "Still in a release window after %.0fs, stopping anyway",
+                    self.config.max_delay_seconds,
+                )
+                return
+            LOGGER.info(
+                "Release window until %s, holding shutdown (signal again to force)",
+                _isoformat(window[1]),
+            )
+            self.forced.wait(min(window[1], deadline) - now)
+
+    def drain(self) -> bool:
+        """Stop the scheduler and wait for running jobs, returning if they finished."""
+        save_state(self.config.state_path, self.scheduler)
+        LOGGER.info("Waiting for running jobs to finish")
+        thread = threading.Thread(
+            target=self.scheduler.shutdown, name="drain", daemon=True
+        )
+        thread.start()
+        deadline = time.monotonic() + self.config.drain_timeout_seconds
+        while thread.is_alive() and not self.forced.is_set():
+            if time.monotonic() >= deadline:
+                break
+            thread.join(0.5)
+        if thread.is_alive():
+            LOGGER.warning("Running jobs did not finish, stopping without them")
+            return False
+        LOGGER.info("All running jobs finished")
+        return True
+
+
+def save_state(path: str, scheduler: Scheduler) -> None:
+    """
+    Write pending jobs and warm state to path.
+
+    Tokens, venue settings and the validated config are already kept on disk
+    by their own modules; this adds what only lives in memory.
+    """
+    now = time.time()
+    with scheduler.releases_lock:
+        precise = set(scheduler.releases)
+    with hedger.lock:
+        latencies = {
+            endpoint: list(samples) for endpoint, samples in hedger.latencies.items()
+        }
+    state = {
+        "saved_at": now,
+        "jobs": [
+            {
+                "id": job_id,
+                "name": name,
+                "timestamp": run_at.timestamp(),
+                "release": job_id in precise,
+            }
+            for job_id, name, run_at in scheduler.jobs()
+            if run_at is not None
+        ],
+        "hedging": latencies,
+    }
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "w") as file:
+            json.dump(state, file)
+        os.replace(tmp, path)
+    except OSError as e:
+        LOGGER.warning(f"Failed to save state to {path}: {e}")
+        return
+    LOGGER.info("Saved %d pending jobs to %s", len(state["jobs"]), path)
+
+
+def restore_state(path: str) -> Optional[dict[str, Any]]:
+    """
+    Read back what save_state wrote on the last shutdown.
+
+    Hedge delays pick up where they left off, and release jobs that came due
+    while the app was down are logged and counted as jobs_missed_total.
+    """
+    try:
+        with open(path) as file:
+            state: dict[str, Any] = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        LOGGER.warning(f"Ignoring unreadable state {path}: {e}")
+        return None
+
+    for endpoint, samples in state.get("hedging", {}).items():
+        for seconds in samples:
+            hedger.observe(endpoint, seconds)
+
+    now = time.time()
+    missed = [
+        job
+        for job in state.get("jobs", [])
+        if job.get("release") and job["timestamp"] < now
+    ]
+    for job in missed:
+        LOGGER.warning(
+            "%s was due at %s while stopped", job["id"], _isoformat(job["timestamp"])
+        )
+    metrics.inc("jobs_missed_total", len(missed))
+    LOGGER.info(
+        "Restored state saved %.0fs ago (%d jobs pending then)",
+        now - state.get("saved_at", now),
+        len(state.get("jobs", [])),
+    )
+    return state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Print when the app can next be restarted without missing a release"
+    )
+    parser.parse_args()
+
+    from app.bookers.clubspark.history import configure_history
+    from app.core.settings import get_settings
+    from app.tasks.scheduling import make_schedules
+
+    settings = get_settings()
+    configure_history(settings.app.history)
+    now = time.time()
+    config = settings.app.shutdown
+    releases = [
+        task.run_at.timestamp()
+        for task in make_schedules(settings)
+        if task.precise
+        and task.run_at.timestamp() >= now - config.blackout_after_seconds
+    ]
+    print(json.dumps(next_safe_restart(releases, config, now), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,14 @@
 import smtplib
 from email.mime.text import MIMEText
 
-from app.core.settings import settings
+from app.core.settings import get_settings
 
 
 def send_email(subject: str, content: str, to_email: str | None) -> None:
     if to_email is None:
         return
 
+    settings = get_settings()
     smtp_server = settings.app.smtp_host
     smtp_port = settings.app.smtp_port
     username = settings.app.smtp_username
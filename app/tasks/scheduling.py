@@ -1,23 +1,23 @@
 import datetime
-import uuid
+import logging
 from dataclasses import dataclass
 from typing import Any, Callable
-
-import pytz
-
-from app.booking.clubspark import make_clubspark_booking
+from zoneinfo import ZoneInfo
+
+from app.bookers.clubspark.history import (
+    get_history,
+    inferred_offsets,
+    record_release_window,
+)
+from app.bookers.clubspark.venues import get_venue_cache, skip_reason
+from app.booking import run_booking
 from app.core.config.better import BetterConfig
 from app.core.config.clubspark import ClubsparkConfig
 from app.core.config.gymbox import GymboxConfig
-from app.core.settings import Config
-from app.core.settings import settings as app_settings
+from app.core.release_times import make_calendar, release_time, resolve_timezone
+from app.core.settings import AppConfig, Config
 
-tz = pytz.timezone(app_settings.app.timezone)
-now = datetime.datetime.now(tz)
-today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-calendar = [
-    today + datetime.timedelta(days=i) for i in range(app_settings.app.lookahead_days)
-]
+LOGGER = logging.getLogger(__name__)
 
 
 @dataclass
@@ -27,47 +27,124 @@ class ScheduledTask:
     action: Callable[..., None]
     args: list[Any] | None = None
     kwargs: dict[Any, Any] | None = None
+    job_id: str | None = None
+    # start within a millisecond of run_at, for jobs racing a release
+    precise: bool = False
+    # for selecting jobs to profile
+    provider: str | None = None
+    venue: str | None = None
 
 
-def make_clubspark_schedule(settings: ClubsparkConfig) -> list[ScheduledTask]:
+def make_clubspark_schedule(
+    settings: ClubsparkConfig, app: AppConfig, calendar: list[datetime.date]
+) -> list[ScheduledTask]:
     scheduled: list[ScheduledTask] = []
+    history_config = app.history
+    history = get_history()
+    tuned_offsets = (
+        inferred_offsets(history, app.timezone, history_config.min_samples)
+        if history is not None and history_config.auto_apply
+        else {}
+    )
+    venue_cache = get_venue_cache()
+    skipped: dict[str, str] = {}
+    # (park, date) -> user, durations and release time of each release to record
+    recordings: dict[tuple[str, str], tuple[str, set[int], datetime.datetime]] = {}
+
     for slot in settings.booking_slots:
+        assert slot.id is not None
         release_schedule = settings.get_rs_by_id(slot.target_park)
         release_offset = datetime.timedelta(
             days=release_schedule.days,
             hours=release_schedule.hours,
             minutes=release_schedule.minutes,
         )
-        user_config = settings.get_user_by_id(slot.user)
+        if slot.target_park in tuned_offsets:
+            tuned_offset, samples = tuned_offsets[slot.target_park]
+            LOGGER.info(
+                f"Using release offset {tuned_offset} for {slot.target_park} "
+                f"inferred from {samples} releases (configured: {release_offset})"
+            )
+            release_offset = tuned_offset
+        # the schedule's own zone, else the one the venue reports, else the app's
+        venue = venue_cache.get(slot.target_park) if venue_cache else None
+        tz = resolve_timezone(
+            release_schedule.timezone or (venue.TimeZone if venue else None),
+            app.timezone,
+        )
+        # fail at schedule time rather than fire time for unknown users
+        settings.get_user_by_id(slot.user)
 
         for future_day in calendar:
             if future_day.strftime("%A").lower() == slot.target_day:
-                execution_time = future_day - release_offset
-                uid = str(uuid.uuid4())[:4]
+                execution_time = release_time(future_day, release_offset, tz)
+                date = future_day.isoformat()
+                job_id = f"clubspark:{slot.id}:{date}"
+                reason = venue and skip_reason(venue, slot, future_day, execution_time)
+                if reason:
+                    skipped[job_id] = reason
+                    continue
+
                 scheduled_task = ScheduledTask(
-                    name=f"Clubspark Booking {uid}: {slot.user} {slot.target_day} {slot.target_park} {future_day.date()}",
+                    name=f"Clubspark Booking: {slot.id} {date}",
                     run_at=execution_time,
-                    action=make_clubspark_booking,
-                    args=[user_config, slot, future_day.strftime("%Y-%m-%d")],
+                    action=run_booking,
+                    args=["clubspark", slot.user, slot.id, date],
+                    job_id=job_id,
+                    precise=True,
+                    provider="clubspark",
+                    venue=slot.target_park,
                 )
                 scheduled.append(scheduled_task)
 
+                if history is not None:
+                    _, durations, _ = recordings.setdefault(
+                        (slot.target_park, date), (slot.user, set(), execution_time)
+                    )
+                    durations.add(120 if slot.double_session else 60)
+
+    if venue_cache is not None:
+        venue_cache.report(skipped)
+
+    for (park, date), (user_id, durations, release_at) in recordings.items():
+        scheduled.append(
+            ScheduledTask(
+                name=f"Clubspark History: {park} {date}",
+                run_at=release_at
+                - datetime.timedelta(seconds=history_config.seconds_before_release),
+                action=record_release_window,
+                args=[user_id, park, date, sorted(durations), release_at],
+                job_id=f"clubspark-history:{park}:{date}",
+                provider="clubspark",
+                venue=park,
+            )
+        )
+
     return scheduled
 
 
-def make_better_schedule(settings: BetterConfig) -> list[ScheduledTask]:
+def make_better_schedule(
+    settings: BetterConfig, app: AppConfig, calendar: list[datetime.date]
+) -> list[ScheduledTask]:
     # TODO: implement a better booking tool
     return []
 
 
-def make_gymbox_schedule(settings: GymboxConfig) -> list[ScheduledTask]:
+def make_gymbox_schedule(
+    settings: GymboxConfig, app: AppConfig, calendar: list[datetime.date]
+) -> list[ScheduledTask]:
     # TODO: implement a gymbox booking tool
     return []
 
 
 def make_schedules(settings: Config):
-    clubspark_schedules = make_clubspark_schedule(settings.clubspark)
-    better_schedules = make_better_schedule(settings.better)
-    gymbox_schedules = make_gymbox_schedule(settings.gymbox)
+    calendar = make_calendar(
+        ZoneInfo(settings.app.timezone), settings.app.lookahead_days
+    )
+    clubspark_schedules = make_clubspark_schedule(
+        settings.clubspark, settings.app, calendar
+    )
+    better_schedules = make_better_schedule(settings.better, settings.app, calendar)
+    gymbox_schedules = make_gymbox_schedule(settings.gymbox, settings.app, calendar)
 
     return clubspark_schedules + better_schedules + gymbox_schedules
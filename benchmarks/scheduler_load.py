@@ -0,0 +1,213 @@
+"""
+Scheduler scale and burst benchmark.
+
+For each scale, writes a synthetic config with that many users and measures,
+in a fresh interpreter: building the schedule, adding every job to the
+scheduler, the job store's memory, and replacing every job. Then, for each
+burst size, schedules that many stub jobs at the same instant and measures how
+late each one starts, with and without precise starts. Prints JSON, e.g.
+
+    python benchmarks/scheduler_load.py --scales 10,100,1000 --bursts 10,100
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from synthetic import write_config
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def stub_booking(*args: Any) -> None:
+    """Stands in for run_booking so no job touches the network."""
+
+
+def measure_schedule() -> dict[str, Any]:
+    from app.core.scheduler import Scheduler
+    from app.core.settings import get_settings
+    from app.tasks.scheduling import make_schedules
+
+    settings = get_settings()
+    tracemalloc.start()
+
+    started = time.perf_counter()
+    tasks = make_schedules(settings)
+    build_s = time.perf_counter() - started
+
+    scheduler = Scheduler(settings.app.precision)
+    before, _ = tracemalloc.get_traced_memory()
+
+    def add_all() -> float:
+        started = time.perf_counter()
+        for task in tasks:
+            scheduler.schedule_task(
+                name=task.name,
+                run_at=task.run_at,
+                action=stub_booking,
+                args=task.args,
+                kwargs=task.kwargs,
+                job_id=task.job_id,
+                precise=task.precise,
+            )
+        return time.perf_counter() - started
+
+    add_s = add_all()
+    after, peak = tracemalloc.get_traced_memory()
+    replace_s = add_all()
+
+    started = time.perf_counter()
+    jobs = scheduler.jobs()
+    list_s = time.perf_counter() - started
+    scheduler.shutdown()
+    tracemalloc.stop()
+
+    return {
+        "tasks": len(tasks),
+        # tasks whose release has already passed fire at once and are gone
+        "jobs": len(jobs),
+        "build_s": build_s,
+        "add_s": add_s,
+        "add_per_job_us": add_s / max(len(tasks), 1) * 1e6,
+        "replace_s": replace_s,
+        "list_s": list_s,
+        "job_store_bytes": after - before,
+        "job_store_bytes_per_job": (after - before) / max(len(tasks), 1),
+        "peak_traced_bytes": peak,
+    }
+
+
+def measure_burst(size: int, precise: bool) -> dict[str, Any]:
+    from app.core.config.app import PrecisionConfig
+    from app.core.scheduler import Scheduler
+
+    precision = PrecisionConfig(enabled=precise)
+    scheduler = Scheduler(precision)
+    lock = threading.Lock()
+    done = threading.Event()
+    delays: list[float] = []
+    # far enough out that scheduling every job finishes before the lead starts
+    target = time.time() + precision.lead_seconds + 1 + size / 2000
+
+    def started(*args: Any) -> None:
+        delay = time.time() - target
+        with lock:
+            delays.append(delay * 1000)
+            if len(delays) == size:
+                done.set()
+
+    run_at = datetime.fromtimestamp(target, timezone.utc)
+    for i in range(size):
+        scheduler.schedule_task(
+            name=f"burst {i}",
+            run_at=run_at,
+            action=started,
+            job_id=f"burst:{i}",
+            precise=precise,
+        )
+    # jobs still queued for a thread past the misfire grace time never start
+    done.wait(timeout=target - time.time() + 10 + size * 0.01)
+    executor = scheduler.executor_state()
+    scheduler.shutdown()
+
+    ordered = sorted(delays)
+    return {
+        "jobs": size,
+        "precise": precise,
+        "started": len(ordered),
+        "missed": size - len(ordered),
+        "max_workers": executor["max_workers"],
+        "start_latency_ms": {
+            "mean": statistics.fmean(ordered) if ordered else None,
+            **{
+                f"p{round(q * 100)}": ordered[
+                    min(len(ordered) - 1, int(q * len(ordered)))
+                ]
+                if ordered
+                else None
+                for q in (0.5, 0.9, 0.99)
+            },
+            "max": ordered[-1] if ordered else None,
+        },
+    }
+
+
+def worker(args: argparse.Namespace) -> None:
+    if args.worker == "schedule":
+        result = measure_schedule()
+    else:
+        result = measure_burst(args.size, args.precise)
+    print(json.dumps(result))
+
+
+def run_worker(cwd: Path, env: dict[str, str], *flags: str) -> dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--worker", *flags],
+        cwd=cwd,
+        env={**env, "PYTHONPATH": f"{ROOT}:{Path(__file__).resolve().parent}"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", default="10,100,1000", help="users per run")
+    parser.add_argument("--slots-per-user", type=int, default=2)
+    parser.add_argument("--parks", type=int, default=10)
+    parser.add_argument("--bursts", default="10,100,500", help="jobs per burst")
+    parser.add_argument("--output")
+    parser.add_argument(
+        "--worker", choices=["schedule", "burst"], help=argparse.SUPPRESS
+    )
+    parser.add_argument("--size", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--precise", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    report: dict[str, Any] = {"scale": [], "burst": []}
+    for users in (int(n) for n in args.scales.split(",") if n):
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = Path(tmp)
+            # every park needs a slot, or the config fails validation
+            parks = min(args.parks, users + args.slots_per_user - 1)
+            env = write_config(
+                cwd, users=users, slots_per_user=args.slots_per_user, parks=parks
+            )
+            result = run_worker(cwd, env, "schedule")
+        report["scale"].append(
+            {"users": users, "slots": users * args.slots_per_user, **result}
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = Path(tmp)
+        env = write_config(cwd)
+        for size in (int(n) for n in args.bursts.split(",") if n):
+            for precise in (False, True):
+                flags = ["burst", "--size", str(size)]
+                report["burst"].append(
+                    run_worker(cwd, env, *flags, *(["--precise"] if precise else []))
+                )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
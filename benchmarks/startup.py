@@ -0,0 +1,119 @@
+"""
+Cold-start and import-cost benchmark.
+
+Runs each measurement in a fresh interpreter against a synthetic config and
+prints the results as JSON, e.g.
+
+    python benchmarks/startup.py --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from synthetic import write_config
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["apscheduler", "cryptography", "jose", "pydantic", "requests", "yaml"]
+
+COLD_START = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from app.core.settings import get_settings
+settings = get_settings()
+t2 = time.perf_counter()
+scheduler = main.start(settings)
+t3 = time.perf_counter()
+jobs = len(scheduler.scheduler.get_jobs())
+scheduler.shutdown()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "load_config_s": t2 - t1,
+    "schedule_s": t3 - t2,
+    "total_s": t3 - t0,
+    "jobs": jobs,
+}))
+"""
+
+IMPORT_ONLY = """
+import json, sys
+import main
+print(json.dumps(sorted({m.split(".")[0] for m in sys.modules})))
+"""
+
+
+def run(code: str, cwd: Path, env: dict[str, str], *flags: str) -> tuple[str, str]:
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=cwd,
+        env={**env, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout, result.stderr
+
+
+def import_times(stderr: str) -> dict[str, float]:
+    """Cumulative import time (ms) of each top-level package, from -X importtime."""
+    times: dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[12:].split("|"))
+        if not cumulative.isdigit() or name.startswith(" "):
+            continue
+        if "." not in name:
+            times[name] = max(times.get(name, 0.0), int(cumulative) / 1000)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--slots-per-user", type=int, default=2)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = Path(tmp)
+        env = write_config(cwd, users=args.users, slots_per_user=args.slots_per_user)
+
+        runs = [
+            json.loads(run(COLD_START, cwd, env)[0].strip().splitlines()[-1])
+            for _ in range(args.runs)
+        ]
+        _, stderr = run("import main", cwd, env, "-X", "importtime")
+        loaded = set(json.loads(run(IMPORT_ONLY, cwd, env)[0]))
+
+    times = import_times(stderr)
+    report = {
+        "runs": args.runs,
+        "jobs": runs[0]["jobs"],
+        "cold_start": {
+            key: statistics.median(r[key] for r in runs)
+            for key in ("import_s", "load_config_s", "schedule_s", "total_s")
+        },
+        "import_ms": {
+            "main": times.get("main"),
+            **{name: times.get(name) for name in HEAVY_MODULES},
+        },
+        "imported_by_main": {name: name in loaded for name in HEAVY_MODULES},
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
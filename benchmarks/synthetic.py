@@ -0,0 +1,79 @@
+"""Synthetic configs for the benchmarks."""
+
+import os
+from pathlib import Path
+from typing import Any
+
+import yaml
+from cryptography.fernet import Fernet
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def make_config(
+    users: int, slots_per_user: int, parks: int, key: str
+) -> dict[str, Any]:
+    fernet = Fernet(key)
+
+    def secret(value: str) -> str:
+        return fernet.encrypt(value.encode()).decode()
+
+    park_ids = [f"park{p}" for p in range(parks)]
+    return {
+        "app": {
+            "timezone": "Europe/London",
+            "lookahead_days": 365,
+            "emails_enabled": False,
+            "add_debug_task": False,
+        },
+        "users": {
+            "clubspark": [
+                {
+                    "id": f"user{u}",
+                    "username": f"user{u}",
+                    "password": secret("password"),
+                    "card_number": secret("4242424242424242"),
+                    "card_expiry": secret("12/30"),
+                    "card_cvc": secret("123"),
+                }
+                for u in range(users)
+            ]
+        },
+        "booking_slots": {
+            "clubspark": [
+                {
+                    "user": f"user{u}",
+                    "target_day": DAYS[(u + s) % len(DAYS)],
+                    "target_times": ["18:00", "19:00"],
+                    "target_park": park_ids[(u + s) % parks],
+                    "target_courts": [1, 2, 3, 4],
+                }
+                for u in range(users)
+                for s in range(slots_per_user)
+            ]
+        },
+        "release_schedules": {
+            "clubspark": [
+                {"id": park, "days": 7, "hours": 0, "minutes": 0} for park in park_ids
+            ]
+        },
+    }
+
+
+def write_config(
+    directory: Path, users: int = 2, slots_per_user: int = 2, parks: int = 2
+) -> dict[str, str]:
+    """Write config.yml and .env into directory, returning the env to run with."""
+    key = Fernet.generate_key().decode()
+    config = make_config(users, slots_per_user, parks, key)
+    (directory / "config.yml").write_text(yaml.safe_dump(config))
+    env = {
+        "ENCRYPTION_KEY": key,
+        "SMTP_USERNAME": "bench",
+        "SMTP_PASSWORD": "bench",
+        "SMTP_HOST": "localhost",
+        "SMTP_PORT": "25",
+        "EMAIL_FROM": "bench@localhost",
+    }
+    (directory / ".env").write_text("".join(f"{k}={v}\n" for k, v in env.items()))
+    return {**os.environ, **env}
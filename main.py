@@ -1,49 +1,144 @@
+import datetime
 import logging
-import time
+import os
 
+from app.bookers.clubspark.history import configure_history
+from app.bookers.clubspark.venues import configure_venue_check, get_venue_cache
+from app.bookers.clubspark.watcher import CancellationWatcher
+from app.core.coordination import configure_coordination
+from app.core.egress import egress
+from app.core.health import HealthServer
+from app.core.hedging import hedger
+from app.core.ledger import configure_ledger
+from app.core.log import configure_logging, stop_logging
+from app.core.profiling import configure_profiling, should_profile
+from app.core.rate_limit import rate_limiter
 from app.core.scheduler import Scheduler
-from app.core.settings import load_config
-from app.tasks.scheduling import make_schedules
+from app.core.settings import Config, get_settings
+from app.core.shutdown import GracefulShutdown, restore_state
+from app.tasks.scheduling import ScheduledTask, make_schedules
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def main():
-    settings = load_config()
-    scheduler = Scheduler()
+def start(settings: Config) -> Scheduler:
+    """Configure the app and schedule every job, returning the running scheduler."""
+    rate_limiter.configure(settings.app.rate_limit)
+    egress.configure(settings.app.egress)
+    hedger.configure(settings.app.hedging)
+    configure_ledger(settings.app.ledger)
+    configure_history(settings.app.history)
+    configure_coordination(settings.app.coordination)
+    configure_profiling(settings.app.profiling)
+    restore_state(settings.app.shutdown.state_path)
+    venue_cache = configure_venue_check(settings.app.venue_check)
+    scheduler = Scheduler(settings.app.precision)
 
-    scheduled_tasks = make_schedules(settings)
-    for task in scheduled_tasks:
-        scheduler.schedule_task(
-            name=task.name,
-            run_at=task.run_at,
-            action=task.action,
-            args=task.args,
-            kwargs=task.kwargs,
+    for task in make_schedules(settings):
+        schedule(scheduler, task)
+
+    if venue_cache is not None:
+        scheduler.schedule_recurring(
+            name="Clubspark Venue Check",
+            every=datetime.timedelta(minutes=settings.app.venue_check.refresh_minutes),
+            action=recheck_venues,
+            args=[scheduler],
+            first_run=datetime.datetime.now(datetime.UTC)
+            + datetime.timedelta(seconds=30),
         )
 
     if settings.app.add_debug_task:
-        import datetime
-
-        import pytz
+        from zoneinfo import ZoneInfo
 
-        from app.booking.clubspark import make_clubspark_booking
+        from app.booking import run_booking
 
-        tz = pytz.timezone(settings.app.timezone)
+        tz = ZoneInfo(settings.app.timezone)
         scheduler.schedule_task(
             name="debugging task",
             run_at=datetime.datetime.now(tz) + datetime.timedelta(seconds=10),
-            action=make_clubspark_booking,
-            args=[
-                settings.clubspark.get_user_by_id("liam"),
-                settings.clubspark.get_bs_by_id("liamthurs"),
-                "2025-09-11",
-            ],
+            action=run_booking,
+            args=["clubspark", "liam", "liamthurs", "2025-09-11"],
         )
 
-    while True:
-        time.sleep(1)
+    return scheduler
+
+
+def schedule(scheduler: Scheduler, task: ScheduledTask) -> None:
+    scheduler.schedule_task(
+        name=task.name,
+        run_at=task.run_at,
+        action=task.action,
+        args=task.args,
+        kwargs=task.kwargs,
+        job_id=task.job_id,
+        precise=task.precise,
+        profile=should_profile(task.provider, task.venue, task.job_id or "", task.name),
+    )
+
+
+def recheck_venues(scheduler: Scheduler) -> None:
+    """
+    Refresh venue settings and bring the schedule in line with them.
+
+    Jobs the venues can no longer honour are removed; previously skipped jobs
+    that can now succeed are added back, and pending jobs whose release moved
+    (e.g. the venue's time zone changed) are rescheduled. Jobs that have
+    already fired are left alone, so none is scheduled twice.
+    """
+    venue_cache = get_venue_cache()
+    settings = get_settings()
+    if venue_cache is None or not venue_cache.refresh(settings.clubspark):
+        return
+
+    previously_skipped = set(venue_cache.skipped)
+    tasks = make_schedules(settings)
+    for job_id in set(venue_cache.skipped) - previously_skipped:
+        if scheduler.remove_job(job_id):
+            logger.info("Unscheduled %s", job_id)
+
+    now = datetime.datetime.now(datetime.UTC)
+    for task in tasks:
+        if task.job_id is None or task.run_at <= now:
+            continue
+        if task.job_id in previously_skipped:
+            if not scheduler.has_job(task.job_id):
+                schedule(scheduler, task)
+                logger.info("Rescheduled %s", task.job_id)
+            continue
+        run_at = scheduler.run_at(task.job_id)
+        if run_at is not None and abs((run_at - task.run_at).total_seconds()) > 0.001:
+            schedule(scheduler, task)
+            logger.info("Moved %s from %s to %s", task.job_id, run_at, task.run_at)
+
+
+def main():
+    settings = get_settings()
+    configure_logging(settings.app.logging)
+    scheduler = start(settings)
+    shutdown = GracefulShutdown(scheduler, settings.app.shutdown)
+    shutdown.install()
+    health = watcher = None
+    if settings.app.health.enabled:
+        health = HealthServer(scheduler, settings.app.health)
+        health.start()
+    if settings.app.watcher.enabled:
+        watcher = CancellationWatcher(settings.app.watcher, scheduler)
+        watcher.start()
+
+    shutdown.wait()
+    shutdown.hold()
+    if watcher is not None:
+        watcher.stop()
+    drained = shutdown.drain()
+    if health is not None:
+        health.stop()
+    logger.info("Stopped")
+    if not drained:
+        # don't let the interpreter wait on jobs still running, but write out
+        # what's still queued for the log first
+        stop_logging()
+        logging.shutdown()
+        os._exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,32 @@
+import datetime
+import unittest
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from app.core import release_times
+from app.core.release_times import REFERENCE_ZONES, SWEEP_OFFSETS, sweep
+
+START = datetime.date(2020, 1, 1)
+DAYS = 10 * 366
+
+
+class SweepTest(unittest.TestCase):
+    def test_release_times_match_the_reference_in_every_zone(self) -> None:
+        for zone in REFERENCE_ZONES:
+            with self.subTest(zone=zone):
+                self.assertEqual(sweep(ZoneInfo(zone), START, DAYS, SWEEP_OFFSETS), [])
+
+    def test_sweep_catches_absolute_arithmetic(self) -> None:
+        def absolute(
+            date: datetime.date, offset: datetime.timedelta, tz: ZoneInfo
+        ) -> datetime.datetime:
+            utc = release_times.midnight(date, tz).astimezone(datetime.timezone.utc)
+            return utc - offset
+
+        with mock.patch.object(release_times, "release_time", absolute):
+            problems = sweep(ZoneInfo("Europe/London"), START, DAYS, SWEEP_OFFSETS)
+        self.assertNotEqual(problems, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from app.core.config.app import PrecisionConfig
+from app.core.scheduler import Scheduler
+
+
+class PreciseBurstTest(unittest.TestCase):
+    def test_burst_larger_than_pool_starts_every_job(self) -> None:
+        precision = PrecisionConfig(lead_seconds=1.5, max_workers=4)
+        scheduler = Scheduler(precision)
+        self.addCleanup(scheduler.shutdown)
+        size = 12
+        lock = threading.Lock()
+        started: list[str] = []
+        done = threading.Event()
+
+        def start(name: str) -> None:
+            with lock:
+                started.append(name)
+                if len(started) == size:
+                    done.set()
+
+        target = time.time() + precision.lead_seconds + 0.5
+        run_at = datetime.fromtimestamp(target, timezone.utc)
+        for i in range(size):
+            scheduler.schedule_task(
+                name=f"burst {i}",
+                run_at=run_at,
+                action=start,
+                args=[f"burst {i}"],
+                precise=True,
+            )
+
+        done.wait(timeout=target - time.time() + 10)
+        self.assertEqual(len(started), size)
+
+
+class RunNowTest(unittest.TestCase):
+    def test_shutdown_waits_for_jobs_run_now(self) -> None:
+        scheduler = Scheduler(PrecisionConfig())
+        started = threading.Event()
+        finished = threading.Event()
+
+        def book() -> None:
+            started.set()
+            time.sleep(0.5)
+            finished.set()
+
+        scheduler.run_now("watch:booking", book)
+        self.assertTrue(started.wait(timeout=5))
+        scheduler.shutdown()
+        self.assertTrue(finished.is_set())
+
+
+class RunAtTest(unittest.TestCase):
+    def test_run_at_is_the_time_given_for_precise_and_other_jobs(self) -> None:
+        scheduler = Scheduler(PrecisionConfig(lead_seconds=30))
+        self.addCleanup(scheduler.shutdown, wait=False)
+        run_at = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(hours=1)
+        scheduler.schedule_task("precise", run_at, print, job_id="a", precise=True)
+        scheduler.schedule_task("plain", run_at, print, job_id="b")
+
+        self.assertEqual(scheduler.run_at("a"), run_at)
+        self.assertEqual(scheduler.run_at("b"), run_at)
+        self.assertIsNone(scheduler.run_at("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()